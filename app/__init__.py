@@ -5,13 +5,25 @@ from flask import Flask, render_template
 from flask_bootstrap import Bootstrap
 from flask_login import LoginManager
 from flask_migrate import Migrate
-from flask_sqlalchemy import SQLAlchemy
+from werkzeug.contrib.fixers import ProxyFix
 
 # local imports
 from config import app_config
+from .admission import AdmissionControl
+from .metrics import Metrics
+from .profiler import Profiler
+from .slowlog import SlowQueryLog
+from .tenancy import Tenancy, TenantSQLAlchemy
+from .throttle import LoginThrottle
 
-db = SQLAlchemy()
+db = TenantSQLAlchemy()
+admission = AdmissionControl()
 login_manager = LoginManager()
+login_throttle = LoginThrottle()
+metrics = Metrics()
+profiler = Profiler()
+slow_query_log = SlowQueryLog()
+tenancy = Tenancy()
 
 
 def create_app(config_name):
@@ -19,12 +31,23 @@ def create_app(config_name):
     app.config.from_object(app_config[config_name])
     app.config.from_pyfile('config.py')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if app.config.get('PROXY_COUNT'):
+        # request.remote_addr becomes the client's address, as the nearest
+        # of our proxies saw it in X-Forwarded-For
+        app.wsgi_app = ProxyFix(app.wsgi_app, num_proxies=app.config['PROXY_COUNT'])
 
     Bootstrap(app)
     db.init_app(app)
     login_manager.init_app(app)
     login_manager.login_message = "You must be logged in to access this page."
     login_manager.login_view = "auth.login"
+    login_throttle.init_app(app)
+    metrics.init_app(app)
+    # after metrics, so refused requests are still counted
+    admission.init_app(app)
+    profiler.init_app(app)
+    slow_query_log.init_app(app)
+    tenancy.init_app(app)
     migrate = Migrate(app, db)
 
     from app import models
@@ -32,12 +55,18 @@ def create_app(config_name):
     from .admin import admin as admin_blueprint
     app.register_blueprint(admin_blueprint, url_prefix='/admin')
 
+    from .api import api as api_blueprint
+    app.register_blueprint(api_blueprint, url_prefix='/api')
+
     from .auth import auth as auth_blueprint
     app.register_blueprint(auth_blueprint)
 
     from .home import home as home_blueprint
     app.register_blueprint(home_blueprint)
 
+    from .commands import register_commands
+    register_commands(app)
+
     @app.errorhandler(403)
     def forbidden(error):
         return render_template('errors/403.html', title='Forbidden'), 403
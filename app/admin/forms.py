@@ -1,9 +1,18 @@
 # app/admin/forms.py
 
 from flask_wtf import FlaskForm
-from wtforms import PasswordField, StringField, SubmitField, ValidationError, IntegerField, BooleanField, DecimalField, SelectField, DateField
+from wtforms import PasswordField, StringField, SubmitField, ValidationError, IntegerField, BooleanField, DecimalField, SelectField, DateField, HiddenField
 from wtforms.validators import DataRequired, Email, EqualTo, Length, NumberRange, AnyOf, Optional
 from ..models import Employee, Payroll, Compensation
+from ..periods import find_overlap
+from ..withholding import MissingTaxTable, check_tables
+
+STATES = ['AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'FL', 'GA', 'HI', 'ID',
+          'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MD', 'MA', 'MI', 'MN', 'MS',
+          'MO', 'MT', 'NE', 'NV', 'NH', 'NJ', 'NM', 'NY', 'NC', 'ND', 'OH', 'OK',
+          'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV',
+          'WI', 'WY']
+STATE_CHOICES = [(state, state) for state in STATES]
 
 
 class RegistrationForm(FlaskForm):
@@ -19,19 +28,7 @@ class RegistrationForm(FlaskForm):
     street = StringField('Street', validators=[DataRequired(), Length(min=1, max=60)])
     city = StringField('City', validators=[DataRequired(), Length(min=1, max=60)])
     zip = IntegerField('ZIP', validators=[DataRequired(), NumberRange(min=1000, max=99999)])
-    state = SelectField('State', choices = [('AL', 'AL'), ('AK', 'AK'), ('AZ', 'AZ'), ('AR', 'AR'), 
-                                            ('CA', 'CA'), ('CO', 'CO'), ('CT', 'CT'), ('DE', 'DE'), 
-                                            ('FL', 'FL'), ('GA', 'GA'), ('HI', 'HI'), ('ID', 'ID'), 
-                                            ('IL', 'IL'), ('IN', 'IN'), ('IA', 'IA'), ('KS', 'KS'), 
-                                            ('KY', 'KY'), ('LA', 'LA'), ('ME', 'ME'), ('MD', 'MD'), 
-                                            ('MA', 'MA'), ('MI', 'MI'), ('MN', 'MN'), ('MS', 'MS'), 
-                                            ('MO', 'MO'), ('MT', 'MT'), ('NE', 'NE'), ('NV', 'NV'), ('NH', 'NH'),
-                                            ('NJ', 'NJ'), ('NM', 'NM'), ('NY', 'NY'),
-                                            ('NC', 'NC'), ('ND', 'ND'), ('OH', 'OH'), ('OK', 'OK'), 
-                                            ('OR', 'OR'), ('PA', 'PA'), ('RI', 'RI'), ('SC', 'SC'), 
-                                            ('SD', 'SD'), ('TN', 'TN'), ('TX', 'TX'), ('UT', 'UT'), 
-                                            ('VT', 'VT'), ('VA', 'VA'), ('WA', 'WA'), ('WV', 'WV'), 
-                                            ('WI', 'WI'), ('WY', 'WY')])
+    state = SelectField('State', choices=STATE_CHOICES)
     home_phone = IntegerField('Home Phone (Format: xxxxxxxxxx)', validators=[Optional()], default='None')
     cell_phone = IntegerField('Cell Phone (Format: xxxxxxxxxx)', validators=[DataRequired()])
 
@@ -40,14 +37,21 @@ class RegistrationForm(FlaskForm):
                                         EqualTo('confirm_password')
                                         ])
     confirm_password = PasswordField('Confirm Password')
+    # checked to go ahead although the registration matches employees on file
+    not_duplicate = BooleanField('Register even if this looks like an existing employee',
+                                 default=False)
     submit = SubmitField('Register')
 
+    # emails and ids are unique across companies, so these look in all of them
+
     def validate_email(self, field):
-        if Employee.query.filter_by(email=field.data).first():
+        if Employee.query.execution_options(all_companies=True) \
+                .filter_by(email=field.data).first():
             raise ValidationError('Email is already in use.')
 
-    def validate_emp_id(self, field):
-        if Employee.query.filter_by(id=field.data).first():
+    def validate_id(self, field):
+        if Employee.query.execution_options(all_companies=True) \
+                .filter_by(id=field.data).first():
             raise ValidationError('Employee ID is already in use.')
 
 
@@ -64,23 +68,16 @@ class PersonalInfoForm(FlaskForm):
     street = StringField('Street', validators=[DataRequired(), Length(min=1, max=60)])
     city = StringField('City', validators=[DataRequired(), Length(min=1, max=60)])
     zip = IntegerField('ZIP', validators=[DataRequired(), NumberRange(min=1000, max=99999)])
-    state = SelectField('State', choices = [('AL', 'AL'), ('AK', 'AK'), ('AZ', 'AZ'), ('AR', 'AR'), 
-                                            ('CA', 'CA'), ('CO', 'CO'), ('CT', 'CT'), ('DE', 'DE'), 
-                                            ('FL', 'FL'), ('GA', 'GA'), ('HI', 'HI'), ('ID', 'ID'), 
-                                            ('IL', 'IL'), ('IN', 'IN'), ('IA', 'IA'), ('KS', 'KS'), 
-                                            ('KY', 'KY'), ('LA', 'LA'), ('ME', 'ME'), ('MD', 'MD'), 
-                                            ('MA', 'MA'), ('MI', 'MI'), ('MN', 'MN'), ('MS', 'MS'), 
-                                            ('MO', 'MO'), ('MT', 'MT'), ('NE', 'NE'), ('NV', 'NV'), ('NH', 'NH'),
-                                            ('NJ', 'NJ'), ('NM', 'NM'), ('NY', 'NY'),
-                                            ('NC', 'NC'), ('ND', 'ND'), ('OH', 'OH'), ('OK', 'OK'), 
-                                            ('OR', 'OR'), ('PA', 'PA'), ('RI', 'RI'), ('SC', 'SC'), 
-                                            ('SD', 'SD'), ('TN', 'TN'), ('TX', 'TX'), ('UT', 'UT'), 
-                                            ('VT', 'VT'), ('VA', 'VA'), ('WA', 'WA'), ('WV', 'WV'), 
-                                            ('WI', 'WI'), ('WY', 'WY')])
+    state = SelectField('State', choices=STATE_CHOICES)
     home_phone = IntegerField('Home Phone (Format: xxxxxxxxxx)', validators=[Optional()], default='None')
     cell_phone = IntegerField('Cell Phone (Format: xxxxxxxxxx)', validators=[DataRequired()])
+    version = HiddenField()
     submit = SubmitField('Submit')
 
+    # the columns edit views save, see app/binding.py
+    model_fields = ('first_name', 'last_name', 'middle_name', 'dob', 'email', 'street',
+                    'city', 'zip', 'state', 'home_phone', 'cell_phone')
+
 
 
 class PayrollForm(FlaskForm):
@@ -94,7 +91,12 @@ class PayrollForm(FlaskForm):
     amount_withheld = IntegerField('Amount Withheld', validators=[ NumberRange(min=0)])
     num_allowances = IntegerField('Number of Allowances', validators=[ NumberRange(min=0)])
     claim_exemption = BooleanField('Claim Exemption', validators=[], default=False)
+    version = HiddenField()
     submit = SubmitField('Submit')
+
+    # the columns edit views save, see app/binding.py
+    model_fields = ('account_type', 'account_num', 'routing_num', 'amount_withheld',
+                    'num_allowances', 'claim_exemption')
     
     def validate_eid(self, field):
         if Employee.query.filter_by(id=field.data).first() == None:
@@ -107,12 +109,61 @@ class CompensationForm(FlaskForm):
     eid = StringField('Employee ID', validators=[DataRequired()])
     start_date = DateField('Start Date (format: YYYY-MM-DD)', validators=[DataRequired()], format='%Y-%m-%d')
     end_date = DateField('End Date (format: YYYY-MM-DD)', validators=[DataRequired()], format='%Y-%m-%d')
-    net_pay = DecimalField('Net Pay', validators=[DataRequired()])
+    net_pay = DecimalField('Net Pay (leave blank to calculate withholding)',
+                           validators=[Optional()])
     gross_pay = DecimalField('Gross Pay', validators=[DataRequired()])
     hourly_wage = DecimalField('Hourly Wage', validators=[DataRequired()])
     hours_worked = DecimalField('Hours Worked', validators=[DataRequired()])
+    version = HiddenField()
     submit = SubmitField('Submit')
 
+    # the columns edit views save, see app/binding.py
+    model_fields = ('start_date', 'end_date', 'net_pay', 'gross_pay', 'hourly_wage',
+                    'hours_worked')
+
     def validate_eid(self, field):
         if Employee.query.filter_by(id=field.data).first() == None:
             raise ValidationError('Employee ID not found.')
+
+    def validate_end_date(self, field):
+        if self.start_date.data is None:
+            return
+        if field.data < self.start_date.data:
+            raise ValidationError('End date must not be before the start date.')
+        # `existing` is set by the edit view to the row being edited
+        existing = getattr(self, 'existing', None)
+        overlap = find_overlap(existing.eid if existing else self.eid.data,
+                               self.start_date.data, field.data,
+                               existing.id if existing else None)
+        if overlap is not None:
+            raise ValidationError('This period overlaps the one from {} to {}.'.format(
+                overlap.start_date, overlap.end_date))
+
+    def validate(self):
+        """
+        Also refuse a blank net pay when withholding can't be calculated
+        for the employee's state or the year of the pay period
+        """
+        if not FlaskForm.validate(self):
+            return False
+        if self.net_pay.data is None:
+            existing = getattr(self, 'existing', None)
+            employee = Employee.query.get(existing.eid if existing else self.eid.data)
+            try:
+                check_tables(self.end_date.data.year, employee.state)
+            except MissingTaxTable as e:
+                self.net_pay.errors.append('{} Please enter the net pay.'.format(e))
+                return False
+        return True
+
+
+class ProfilerForm(FlaskForm):
+    """
+    Form for admin to start a sampling profile
+    """
+    endpoint = SelectField('Profile', choices=[('', 'This worker')])
+    seconds = IntegerField('Seconds', validators=[DataRequired(), NumberRange(min=1)], default=30)
+    rate = IntegerField('Samples per Second', validators=[DataRequired(), NumberRange(min=1, max=1000)],
+                        default=100)
+    start = SubmitField('Start')
+    stop = SubmitField('Stop')
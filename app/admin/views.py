@@ -1,12 +1,22 @@
 # app/admin/views.py
 
-from flask import abort, flash, redirect, render_template, url_for
+from datetime import datetime
+
+from flask import Response, abort, current_app, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
 from . import admin
-from forms import PersonalInfoForm, PayrollForm, CompensationForm, RegistrationForm
-from .. import db
-from ..models import Employee, Payroll, Compensation
+from forms import PersonalInfoForm, PayrollForm, CompensationForm, ProfilerForm, RegistrationForm
+from .. import db, profiler, slow_query_log
+from ..binding import update_from_form
+from ..concurrency import check_version, commit_or_conflict
+from ..duplicates import find_duplicates
+from ..history import as_of, parse_day, versions
+from ..offboarding import queue as queue_offboarding
+from ..models import Employee, EmployeeDirectory, Payroll, Compensation
+from ..queries import directory_rows, employee_rows, paginate, payroll_rows
+from ..streaming import stream_rows, stream_template
+from ..withholding import net_pay
 
 
 def check_admin():
@@ -17,6 +27,18 @@ def check_admin():
         abort(403)
 
 
+def as_of_day():
+    """
+    The day asked for with ?as_of=YYYY-MM-DD, today (UTC) if none was
+    """
+    day = request.args.get('as_of', type=parse_day)
+    if day is None:
+        if request.args.get('as_of'):
+            abort(400)
+        day = datetime.utcnow().date()
+    return day
+
+
 
 @admin.route('/addemployee', methods=['GET', 'POST'])
 def add_employee():
@@ -43,6 +65,13 @@ def add_employee():
                             home_phone=form.home_phone.data,
                             cell_phone=form.cell_phone.data)
 
+        # the same person may be on file already, say under an old email
+        duplicates = find_duplicates(employee)
+        if duplicates and not form.not_duplicate.data:
+            flash('This looks like an employee who is already registered.')
+            return render_template('admin/register.html', form=form,
+                                   duplicates=duplicates, title='Register')
+
         # add employee to the database
         db.session.add(employee)
         db.session.commit()
@@ -56,6 +85,23 @@ def add_employee():
 
 
 
+@admin.route('/employees/overview')
+@login_required
+def employee_overview():
+    """
+    List every employee with their payroll and latest compensation
+    """
+    check_admin()
+
+    page = paginate(EmployeeDirectory.query.order_by(EmployeeDirectory.id),
+                    request.args.get('page', 1, type=int),
+                    request.args.get('per_page', 50, type=int),
+                    EmployeeDirectory.query)
+
+    return render_template('admin/employees/overview.html',
+                           page=page, title="Employee Overview")
+
+
 #############################################
 # Personal Info Views
 #############################################
@@ -68,10 +114,9 @@ def list_personalinfos():
     """
     check_admin()
 
-    personalinfos = Employee.query.all()
-
-    return render_template('admin/personalinfos/personalinfos.html',
-                           personalinfos=personalinfos, title="Personal Infos")
+    return stream_template('admin/personalinfos/personalinfos.html',
+                           personalinfos=stream_rows(employee_rows()),
+                           title="Personal Infos")
 
 
 @admin.route('/personalinfos/edit/<int:id>', methods=['GET', 'POST'])
@@ -85,40 +130,63 @@ def edit_personalinfo(id):
     personalinfo = Employee.query.get_or_404(id)
     form = PersonalInfoForm(obj=personalinfo)
     if form.validate_on_submit():
-        personalinfo.first_name = form.first_name.data
-        personalinfo.last_name = form.last_name.data
-        personalinfo.middle_name = form.middle_name.data
-        personalinfo.dob = form.dob.data
-        personalinfo.email = form.email.data
-        personalinfo.street = form.street.data
-        personalinfo.city = form.city.data
-        personalinfo.zip = form.zip.data
-        personalinfo.state = form.state.data
-        personalinfo.home_phone = form.home_phone.data
-        personalinfo.cell_phone = form.cell_phone.data
-
-        db.session.commit()
+        conflict = check_version(form, personalinfo, url_for('admin.edit_personalinfo', id=id))
+        if conflict:
+            return conflict
+
+        if update_from_form(form, personalinfo):
+            conflict = commit_or_conflict(form, Employee, id, url_for('admin.edit_personalinfo', id=id))
+            if conflict:
+                return conflict
         flash('You have successfully edited the employee.')
 
         # redirect to the employee page
         return redirect(url_for('admin.list_personalinfos'))
 
-    form.first_name.data = personalinfo.first_name
-    form.last_name.data = personalinfo.last_name
-    form.middle_name.data = personalinfo.middle_name
-    form.dob.data = personalinfo.dob
-    form.email.data = personalinfo.email
-    form.street.data = personalinfo.street
-    form.city.data = personalinfo.city
-    form.zip.data = personalinfo.zip
-    form.state.data = personalinfo.state
-    form.home_phone.data = personalinfo.home_phone
-    form.cell_phone.data = personalinfo.cell_phone
-
     return render_template('admin/personalinfos/personalinfo.html', action="Edit",
                            form=form,
                            personalinfo=personalinfo, title="Edit Personal Info")
 
+@admin.route('/personalinfos/offboard/<int:id>', methods=['GET', 'POST'])
+@login_required
+def offboard_employee(id):
+    """
+    Queue an employee for offboarding: `flask offboard` archives and
+    removes their records in the background
+    """
+    check_admin()
+
+    Employee.query.get_or_404(id)
+    if id == current_user.id:
+        flash('You cannot offboard yourself.')
+    elif queue_offboarding([id]):
+        db.session.commit()
+        flash('The employee has been queued for offboarding.')
+    else:
+        flash('The employee is already queued for offboarding.')
+
+    return redirect(url_for('admin.list_personalinfos'))
+
+@admin.route('/personalinfos/history/<int:id>')
+@login_required
+def employee_history(id):
+    """
+    Show an employee's personal and payroll info as of ?as_of= and every
+    version of them; the history outlives offboarding
+    """
+    check_admin()
+
+    day = as_of_day()
+    employee_versions = versions(Employee, id)
+    payroll_versions = versions(Payroll, id)
+    if not employee_versions and not payroll_versions:
+        abort(404)
+
+    return render_template('admin/personalinfos/history.html', eid=id, day=day,
+                           employee=as_of(Employee, id, day), payroll=as_of(Payroll, id, day),
+                           employee_versions=employee_versions,
+                           payroll_versions=payroll_versions, title="History")
+
 ###########################################
 # Payroll Views
 ###########################################
@@ -130,9 +198,8 @@ def list_payrolls():
     """
     List payroll info for all employees
     """
-    payrolls = Payroll.query.all()
-    return render_template('admin/payrolls/payrolls.html',
-                           payrolls=payrolls, title='Payrolls')
+    return stream_template('admin/payrolls/payrolls.html',
+                           payrolls=stream_rows(payroll_rows()), title='Payrolls')
 
 
 @admin.route('/payrolls/add', methods=['GET', 'POST'])
@@ -184,25 +251,19 @@ def edit_payroll(id):
     payroll = Payroll.query.get_or_404(id)
     form = PayrollForm(obj=payroll)
     if form.validate_on_submit():
-        payroll.account_type = form.account_type.data
-        payroll.account_num = form.account_num.data
-        payroll.routing_num = form.routing_num.data
-        payroll.amount_withheld = form.amount_withheld.data
-        payroll.num_allowances = form.num_allowances.data
-        payroll.claim_exemption = form.claim_exemption.data
-        db.session.add(payroll)
-        db.session.commit()
+        conflict = check_version(form, payroll, url_for('admin.edit_payroll', id=id))
+        if conflict:
+            return conflict
+
+        if update_from_form(form, payroll):
+            conflict = commit_or_conflict(form, Payroll, id, url_for('admin.edit_payroll', id=id))
+            if conflict:
+                return conflict
         flash('You have successfully edited the payroll info.')
 
         # redirect to the payrolls page
         return redirect(url_for('admin.list_payrolls'))
 
-    form.account_type.data = payroll.account_type
-    form.account_num.data = payroll.account_num
-    form.routing_num.data = payroll.routing_num
-    form.amount_withheld.data = payroll.amount_withheld
-    form.num_allowances.data = payroll.num_allowances
-    form.claim_exemption.data = payroll.claim_exemption
     return render_template('admin/payrolls/payroll.html', add_payroll=add_payroll,
                            form=form, title="Edit Payroll")
 
@@ -238,7 +299,7 @@ def select_employee():
     """
     check_admin()
 
-    employees = Employee.query.all()
+    employees = directory_rows().all()
 
     return render_template('admin/compensations/selectemployee.html',
                            employees=employees, title="Select Employee")
@@ -276,7 +337,9 @@ def add_compensation():
                           hourly_wage=form.hourly_wage.data,
                           hours_worked=form.hours_worked.data,
                          eid=form.eid.data)
-                          
+        if compensation.net_pay is None:
+            compensation.net_pay = net_pay(compensation)
+
         db.session.add(compensation)
         db.session.commit()
         flash('You have successfully added new compensation info.')
@@ -299,27 +362,28 @@ def edit_compensation(id):
 
     compensation = Compensation.query.get_or_404(id)
     form = CompensationForm(obj=compensation)
+    form.existing = compensation
     if form.validate_on_submit():
-        compensation.start_date = form.start_date.data
-        compensation.end_date = form.end_date.data
-        compensation.net_pay = form.net_pay.data
-        compensation.gross_pay = form.gross_pay.data
-        compensation.hourly_wage = form.hourly_wage.data
-        compensation.hours_worked = form.hours_worked.data
-        db.session.add(compensation)
-        db.session.commit()
+        conflict = check_version(form, compensation, url_for('admin.edit_compensation', id=id))
+        if conflict:
+            return conflict
+
+        changed = update_from_form(form, compensation)
+        if compensation.net_pay is None:
+            # the edited row mustn't be flushed by these lookups: its
+            # version-checked UPDATE belongs in commit_or_conflict
+            with db.session.no_autoflush:
+                compensation.net_pay = net_pay(compensation)
+            changed.append('net_pay')
+        if changed:
+            conflict = commit_or_conflict(form, Compensation, id, url_for('admin.edit_compensation', id=id))
+            if conflict:
+                return conflict
         flash('You have successfully edited the compensation info.')
 
         # redirect to the compensations page
         return redirect(url_for('admin.select_employee'))
 
-    form.start_date.data = compensation.start_date
-    form.end_date.data = compensation.end_date
-    form.net_pay.data = compensation.net_pay
-    form.gross_pay.data = compensation.gross_pay
-    form.hourly_wage.data = compensation.hourly_wage
-    form.hours_worked.data = compensation.hours_worked
-    
     return render_template('admin/compensations/compensation.html', add_compensation=add_compensation,
                            form=form, title="Edit Compensation")
 
@@ -341,3 +405,66 @@ def delete_compensation(id):
     return redirect(url_for('admin.select_employee'))
 
     return render_template(title="Delete compensation")
+
+
+#############################################
+# Diagnostics Views
+#############################################
+
+@admin.route('/slowqueries', methods=['GET', 'POST'])
+@login_required
+def list_slow_queries():
+    """
+    List the most recent statements that ran over the slow query threshold
+    """
+    check_admin()
+
+    if request.method == 'POST':
+        slow_query_log.clear()
+        flash('You have successfully cleared the slow query log.')
+        return redirect(url_for('admin.list_slow_queries'))
+
+    return render_template('admin/slowqueries.html', log=slow_query_log,
+                           entries=slow_query_log.entries(), title="Slow Queries")
+
+
+@admin.route('/profiler', methods=['GET', 'POST'])
+@login_required
+def list_profiles():
+    """
+    Start or stop a sampling profile and list the saved ones
+    """
+    check_admin()
+    if not profiler.enabled:
+        abort(404)
+
+    form = ProfilerForm()
+    endpoints = sorted(set(rule.endpoint for rule in current_app.url_map.iter_rules()))
+    form.endpoint.choices = [('', 'This worker')] + [(endpoint, endpoint) for endpoint in endpoints]
+    if form.stop.data:
+        profiler.stop()
+        flash('You have stopped the profile.')
+        return redirect(url_for('admin.list_profiles'))
+    if form.validate_on_submit():
+        name = profiler.start(form.seconds.data, form.rate.data, form.endpoint.data or None)
+        flash('You have started profile {}.'.format(name))
+        return redirect(url_for('admin.list_profiles'))
+
+    return render_template('admin/profiles.html', form=form, profiler=profiler,
+                           control=profiler.control(), profiles=profiler.profiles(),
+                           title="Profiler")
+
+
+@admin.route('/profiler/<name>.folded')
+@login_required
+def download_profile(name):
+    """
+    Download a profile's stacks in collapsed format, for flamegraph tools
+    """
+    check_admin()
+
+    stacks = profiler.collapsed(name)
+    if stacks is None:
+        abort(404)
+    return Response(stacks, mimetype='text/plain', headers={
+        'Content-Disposition': 'attachment; filename={}.folded'.format(name)})
@@ -0,0 +1,143 @@
+# app/admission.py
+
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+# weight of the newest observation in the moving average of pool waits
+SMOOTHING = 0.2
+
+# the body of a 503. Not a template: the site layout shows the current
+# user, and loading them waits for the very connection being rationed.
+BUSY_PAGE = u"""<!DOCTYPE html>
+<html>
+<head><title>Service Unavailable</title></head>
+<body style="text-align: center; font-family: sans-serif;">
+<h1>503 Error</h1>
+<h3>The server is busy right now. Please try again in {} seconds.</h3>
+</body>
+</html>
+"""
+
+
+class AdmissionControl(object):
+    """
+    Per-worker admission control: refuse requests early with a 503 and a
+    Retry-After header when taking them on would only make them queue
+    for a database connection until the proxy gives up.
+
+    Requests are put in classes by endpoint. Admin and login traffic is
+    `priority` and always admitted; endpoints listed in
+    ADMISSION_EXPENSIVE are `expensive`; the rest are `default`. A
+    non-priority request is shed when its class already has its
+    ADMISSION_LIMITS worth of requests in flight in this worker, or when
+    the pool has no connection free and requests of its class have
+    recently waited longer than ADMISSION_MAX_POOL_WAIT for one. Keeping
+    the limits below the pool size leaves connections for priority
+    traffic.
+
+    The pool wait of a request is taken as the time from its start to its
+    first connection checkout, which for these views is the wait plus
+    the little work done before the first query.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._listening = False
+        self.in_flight = {}
+        self.shed = {}
+        self.pool_wait = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Read admission settings from the app config
+        """
+        self.enabled = app.config.get('ADMISSION_ENABLED', True)
+        self.limits = dict(app.config.get('ADMISSION_LIMITS') or {})
+        self.expensive = frozenset(app.config.get('ADMISSION_EXPENSIVE') or ())
+        self.priority_blueprints = frozenset(
+            app.config.get('ADMISSION_PRIORITY_BLUEPRINTS') or ('admin', 'auth'))
+        self.max_pool_wait = app.config.get('ADMISSION_MAX_POOL_WAIT', 0.5)
+        self.retry_after = app.config.get('ADMISSION_RETRY_AFTER', 2)
+        classes = ('priority', 'expensive', 'default')
+        self.in_flight = dict.fromkeys(classes, 0)
+        self.shed = dict.fromkeys(classes, 0)
+        self.pool_wait = dict.fromkeys(classes, 0.0)
+        app.extensions['admission'] = self
+        if not self.enabled:
+            return
+        app.before_request(self._admit)
+        app.teardown_request(self._release)
+        if not self._listening:
+            # every pool, so binds added later are covered too
+            event.listen(Pool, 'checkout', self._checked_out)
+            self._listening = True
+
+    def classify(self, endpoint):
+        """
+        The admission class of an endpoint
+        """
+        if endpoint is None or endpoint in ('static', 'metrics') or \
+                endpoint.split('.')[0] in self.priority_blueprints:
+            return 'priority'
+        if endpoint in self.expensive:
+            return 'expensive'
+        return 'default'
+
+    def saturated(self):
+        """
+        Whether the main engine's pool has no connection left to hand out;
+        pools without a fixed size, such as SQLite's, never are
+        """
+        from . import db
+        pool = db.engine.pool
+        if not hasattr(pool, 'checkedin'):
+            return False
+        # QueuePool keeps its overflow limit private
+        return pool.checkedin() == 0 and pool.overflow() >= getattr(pool, '_max_overflow', 0)
+
+    def _admit(self):
+        kind = self.classify(request.endpoint)
+        with self._lock:
+            if kind != 'priority':
+                limit = self.limits.get(kind)
+                busy = limit is not None and self.in_flight[kind] >= limit
+                if busy or (self.pool_wait[kind] > self.max_pool_wait and self.saturated()):
+                    self.shed[kind] += 1
+                    return self._reject()
+            self.in_flight[kind] += 1
+        g.admission_class = kind
+        g.admission_start = time.time()
+
+    def _release(self, exception):
+        kind = g.pop('admission_class', None)
+        if kind is not None:
+            with self._lock:
+                self.in_flight[kind] -= 1
+
+    def _checked_out(self, dbapi_connection, connection_record, connection_proxy):
+        if not has_request_context():
+            return
+        start = g.pop('admission_start', None)
+        kind = g.get('admission_class')
+        if start is None or kind is None:
+            return
+        wait = time.time() - start
+        with self._lock:
+            self.pool_wait[kind] += SMOOTHING * (wait - self.pool_wait[kind])
+
+    def _reject(self):
+        return BUSY_PAGE.format(self.retry_after), 503, {'Retry-After': str(self.retry_after)}
+
+    def stats(self):
+        """
+        Return (in flight, shed, average pool wait) dicts keyed by class
+        """
+        with self._lock:
+            return dict(self.in_flight), dict(self.shed), dict(self.pool_wait)
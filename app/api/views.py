@@ -0,0 +1,93 @@
+# app/api/views.py
+
+from flask import jsonify, request
+from flask_login import login_required
+
+from . import api
+from ..admin.views import as_of_day, check_admin
+from ..changes import changes_since, serialize
+from ..history import as_of
+from ..models import Employee, Payroll
+from ..queries import employee_overview, paginate, release_connection
+
+
+def _date(value):
+    return value.isoformat() if value is not None else None
+
+
+@api.route('/employees/overview')
+@login_required
+def employee_overview_list():
+    """
+    Employees with their payroll and latest compensation, one page at a time
+    """
+    check_admin()
+
+    page = paginate(employee_overview(),
+                    request.args.get('page', 1, type=int),
+                    request.args.get('per_page', 50, type=int),
+                    Employee.query)
+    release_connection()
+
+    employees = []
+    for employee, compensation in page.items:
+        payroll = employee.payroll
+        employees.append({
+            'id': employee.id,
+            'first_name': employee.first_name,
+            'last_name': employee.last_name,
+            'email': employee.email,
+            'state': employee.state,
+            'payroll': payroll and {
+                'account_type': payroll.account_type,
+                'amount_withheld': payroll.amount_withheld,
+                'num_allowances': payroll.num_allowances,
+                'claim_exemption': payroll.claim_exemption,
+            },
+            'latest_compensation': compensation and {
+                'start_date': _date(compensation.start_date),
+                'end_date': _date(compensation.end_date),
+                'gross_pay': compensation.gross_pay,
+                'net_pay': compensation.net_pay,
+            },
+        })
+
+    return jsonify(employees=employees, page=page.page, pages=page.pages,
+                   total=page.total)
+
+
+@api.route('/changes')
+@login_required
+def list_changes():
+    """
+    Employee, payroll and compensation rows changed since ?cursor=,
+    oldest first. Pass the returned next_cursor to fetch the next page.
+    """
+    check_admin()
+
+    changes, next_cursor, has_more = changes_since(
+        request.args.get('cursor', 0, type=int),
+        min(request.args.get('limit', 500, type=int), 5000))
+    release_connection()
+
+    return jsonify(changes=changes, next_cursor=next_cursor, has_more=has_more)
+
+
+@api.route('/employees/<int:id>/history')
+@login_required
+def employee_history(id):
+    """
+    An employee's personal and payroll info as they were at the end of
+    ?as_of=YYYY-MM-DD (today by default), from their history; null where
+    there was none
+    """
+    check_admin()
+
+    day = as_of_day()
+    employee = as_of(Employee, id, day)
+    payroll = as_of(Payroll, id, day)
+    release_connection()
+
+    return jsonify(id=id, as_of=day.isoformat(),
+                   employee=employee and serialize(employee),
+                   payroll=payroll and serialize(payroll))
@@ -1,11 +1,11 @@
 # app/auth/views.py
 
-from flask import flash, redirect, render_template, url_for
+from flask import flash, redirect, render_template, request, session, url_for
 from flask_login import login_required, login_user, logout_user
 
 from . import auth
 from forms import LoginForm
-from .. import db
+from .. import db, login_throttle
 from ..models import Employee
 
 
@@ -19,6 +19,13 @@ def login():
     Log an employee in through the login form
     """
     form = LoginForm()
+
+    # turn away excess attempts before any database lookup or hashing
+    if request.method == 'POST' and not login_throttle.allow(
+            request.form.get('id'), request.remote_addr):
+        flash('Too many login attempts. Please wait and try again.')
+        return render_template('auth/login.html', form=form, title='Login'), 429
+
     if form.validate_on_submit():
 
         # check whether employee exists in the database and whether
@@ -28,6 +35,8 @@ def login():
                 form.password.data):
             # log employee in
             login_user(employee)
+            # checked against the request's company by load_user
+            session['company_id'] = employee.company_id
 
             # redirect to the appropriate dashboard page
             if employee.is_admin:
@@ -51,6 +60,7 @@ def logout():
     Log an employee out through the logout link
     """
     logout_user()
+    session.pop('company_id', None)
     flash('You have successfully been logged out.')
 
     # redirect to the login page
@@ -0,0 +1,185 @@
+# app/backfill.py
+
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.engine import Engine
+
+from .models import BackfillProgress
+
+# rows per transaction, and seconds to pause between them, unless the
+# caller says otherwise
+CHUNK_SIZE = 1000
+SLEEP = 0.1
+
+# backfills `flask backfill` can run, by name; see register()
+BACKFILLS = {}
+
+# dialects whose DDL commits the transaction it runs in, so a migration
+# holds no locks once its schema change is done
+IMPLICIT_DDL_COMMIT = ('mysql', 'oracle')
+
+Progress = namedtuple('Progress', 'name rows_done last_id max_id elapsed eta finished')
+
+
+@contextmanager
+def _transaction(bind):
+    if isinstance(bind, Engine):
+        with bind.begin() as connection:
+            yield connection
+    else:
+        # the caller's connection, and its transaction: a migration's
+        yield bind
+
+
+class Backfill(object):
+    """
+    Set `values` ({column name: value or SQL expression}, as for
+    UPDATE ... SET) on the rows of `table` matching `where`, a range of
+    primary keys at a time.
+
+    Each chunk is its own short transaction that also records how far the
+    backfill got in backfill_progress, so the table is never locked for
+    long, the app keeps serving while it runs, and an interrupted run
+    resumes after the last chunk that committed. The UPDATEs bypass the
+    ORM: nothing is written to the change log or the employee directory.
+    """
+
+    def __init__(self, name, table, values, where=None, key='id'):
+        self.name = name
+        self.table = table
+        self.values = values
+        self.where = where
+        # an integer primary key; a migration can pass a lightweight
+        # sqlalchemy.sql.table() naming just the columns it needs
+        self.pk = table.c[key]
+
+    def statement(self, low=None, high=None):
+        """
+        The UPDATE for keys above `low` up to `high`, or for the whole
+        table when no range is given
+        """
+        conditions = [c for c in (self.where,) if c is not None]
+        if low is not None:
+            conditions.append(self.pk > low)
+        if high is not None:
+            conditions.append(self.pk <= high)
+        statement = self.table.update().values(self.values)
+        return statement.where(and_(*conditions)) if conditions else statement
+
+    def next_high(self, connection, low, chunk_size):
+        """
+        The key ending the chunk after `low`: one index seek, so gaps in
+        the keys don't make for empty chunks
+        """
+        pk = self.pk
+        query = select([pk])
+        if low is not None:
+            query = query.where(pk > low)
+        high = connection.execute(query.order_by(pk).offset(chunk_size - 1).limit(1)).scalar()
+        if high is None:
+            query = select([func.max(pk)])
+            high = connection.execute(
+                query.where(pk > low) if low is not None else query).scalar()
+        return high
+
+    def progress(self, connection):
+        table = BackfillProgress.__table__
+        return connection.execute(table.select().where(table.c.name == self.name)).first()
+
+    def reset(self, bind):
+        table = BackfillProgress.__table__
+        with _transaction(bind) as connection:
+            connection.execute(table.delete().where(table.c.name == self.name))
+
+    def run(self, bind, chunk_size=CHUNK_SIZE, sleep=SLEEP, report=None):
+        """
+        Process the rows not done yet, committing each chunk when `bind`
+        is an Engine, and calling `report` with a Progress after each.
+        Returns the final Progress.
+        """
+        table = BackfillProgress.__table__
+        started = time.time()
+        with _transaction(bind) as connection:
+            state = self.progress(connection)
+            if state is None:
+                now = datetime.utcnow()
+                connection.execute(table.insert().values(
+                    name=self.name, table_name=self.table.name, rows_done=0,
+                    started_at=now, updated_at=now))
+                state = self.progress(connection)
+            min_id, max_id = connection.execute(
+                select([func.min(self.pk), func.max(self.pk)])).first()
+        last_id = state.last_id
+        first_id = last_id if last_id is not None else (min_id or 1) - 1
+        rows_done = state.rows_done
+        finished = state.finished_at is not None
+
+        while not finished:
+            with _transaction(bind) as connection:
+                high = self.next_high(connection, last_id, chunk_size)
+                now = datetime.utcnow()
+                if high is None:
+                    finished = True
+                    connection.execute(table.update().where(table.c.name == self.name)
+                                       .values(updated_at=now, finished_at=now))
+                else:
+                    rows_done += connection.execute(self.statement(last_id, high)).rowcount
+                    last_id = high
+                    connection.execute(table.update().where(table.c.name == self.name)
+                                       .values(last_id=last_id, rows_done=rows_done,
+                                               updated_at=now))
+            progress = self._progress(rows_done, first_id, last_id, max_id,
+                                      time.time() - started, finished)
+            if report is not None:
+                report(progress)
+            if not finished and sleep:
+                time.sleep(sleep)
+
+        return self._progress(rows_done, first_id, last_id, max_id,
+                              time.time() - started, True)
+
+    def _progress(self, rows_done, first_id, last_id, max_id, elapsed, finished):
+        eta = None
+        if not finished and last_id is not None and elapsed > 0:
+            # keys still to go at the rate keys went by in this run
+            covered = last_id - first_id
+            if covered > 0:
+                eta = max(max_id - last_id, 0) * elapsed / covered
+        return Progress(self.name, rows_done, last_id, max_id, elapsed,
+                        0.0 if finished else eta, finished)
+
+
+def register(backfill):
+    """
+    Make a backfill runnable with `flask backfill NAME`
+    """
+    BACKFILLS[backfill.name] = backfill
+    return backfill
+
+
+def run_in_migration(backfill, **options):
+    """
+    Run a backfill from an Alembic revision's upgrade(), after the
+    schema change it fills in. Offline, a single UPDATE goes into the
+    script. Online, on databases whose DDL commits implicitly (MySQL),
+    the chunks commit on their own connections, since the revision's
+    transaction holds nothing once its schema change is done. Elsewhere,
+    on PostgreSQL or SQLite say, that transaction still holds the locks
+    its DDL took and a second connection would wait on them for ever, so
+    the chunks run in it and commit with the revision; for a large table,
+    register() the backfill and run it after the migration instead.
+    """
+    from alembic import context, op
+
+    if context.is_offline_mode():
+        op.execute(backfill.statement())
+        return None
+    connection = op.get_bind()
+    if connection.dialect.name in IMPLICIT_DDL_COMMIT:
+        return backfill.run(connection.engine, **options)
+    options['sleep'] = 0
+    return backfill.run(connection, **options)
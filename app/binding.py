@@ -0,0 +1,45 @@
+# app/binding.py
+
+# Edit forms list the model columns they edit in `model_fields`. Forms are
+# filled from the row with Form(obj=row); on submit, update_from_form()
+# writes back only what changed.
+
+
+def coerce(column, value):
+    """
+    Convert a form value to what the column holds, so that e.g. the
+    Decimal from a DecimalField compares equal to the float it was
+    loaded from
+    """
+    python_type = column.type.python_type
+    if value is None or isinstance(value, python_type):
+        return value
+    if python_type is str:
+        return unicode(value)
+    return python_type(value)
+
+
+def form_changes(form, instance):
+    """
+    Return {column name: new value} for the form's model_fields whose
+    submitted value differs from the row's
+    """
+    columns = instance.__table__.columns
+    changes = {}
+    for name in form.model_fields:
+        value = coerce(columns[name], form[name].data)
+        if value != getattr(instance, name):
+            changes[name] = value
+    return changes
+
+
+def update_from_form(form, instance):
+    """
+    Set the changed fields on `instance` and return their names. The
+    flush then UPDATEs just those columns; when the list is empty there
+    is nothing to commit.
+    """
+    changes = form_changes(form, instance)
+    for name, value in changes.items():
+        setattr(instance, name, value)
+    return sorted(changes)
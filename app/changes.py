@@ -0,0 +1,136 @@
+# app/changes.py
+
+from datetime import datetime
+
+from flask_sqlalchemy import SignallingSession
+from sqlalchemy import event, select
+from sqlalchemy.orm.attributes import set_committed_value
+
+from . import db
+from .models import Employee, Payroll, Compensation, ChangeLog, ChangeSequence
+
+# models whose writes are published on the change feed, by table name
+TRACKED = dict((model.__tablename__, model) for model in (Employee, Payroll, Compensation))
+
+# columns never published on the feed
+HIDDEN_COLUMNS = ('password_hash',)
+
+
+def allocate_versions(connection, count):
+    """
+    Reserve `count` change versions and return the first one.
+
+    Bumping the single sequence row locks it until the transaction ends,
+    so versions become visible in the order they were handed out and a
+    reader can never skip past a version that commits later.
+    """
+    sequence = ChangeSequence.__table__
+    connection.execute(sequence.update().values(value=sequence.c.value + count))
+    last = connection.execute(select([sequence.c.value])).scalar()
+    return last - count + 1
+
+
+def record_changes(connection, changes, now=None):
+    """
+    Log a list of (table_name, row_id, operation, company_id) changes and
+    stamp the surviving rows with their new change version. Bulk writers
+    that bypass the ORM call this directly. Returns the first version used.
+    """
+    if not changes:
+        return None
+    now = now or datetime.utcnow()
+    version = allocate_versions(connection, len(changes))
+    log, stamps = [], {}
+    for offset, (table_name, row_id, operation, company_id) in enumerate(changes):
+        log.append({'id': version + offset, 'table_name': table_name,
+                    'row_id': row_id, 'operation': operation, 'changed_at': now,
+                    'company_id': company_id})
+        if operation == 'upsert':
+            stamps.setdefault(table_name, []).append(
+                {'_id': row_id, '_version': version + offset, '_now': now})
+    connection.execute(ChangeLog.__table__.insert(), log)
+    for table_name, rows in stamps.items():
+        table = TRACKED[table_name].__table__
+        connection.execute(
+            table.update().where(table.c.id == db.bindparam('_id')).values(
+                change_version=db.bindparam('_version'),
+                updated_at=db.bindparam('_now')),
+            rows)
+    return version
+
+
+@event.listens_for(SignallingSession, 'after_flush')
+def log_changes(session, flush_context):
+    """
+    Record each tracked row the flush inserted, updated or deleted
+    """
+    now = datetime.utcnow()
+    models = tuple(TRACKED.values())
+    key = lambda instance: (instance.__tablename__, instance.id)
+    stamped = sorted((instance for instance in session.new | session.dirty
+                      if isinstance(instance, models) and (
+                          instance in session.new or session.is_modified(instance))),
+                     key=key)
+    deleted = sorted((instance for instance in session.deleted
+                      if isinstance(instance, models)), key=key)
+    changes = [key(instance) + ('upsert', instance.company_id) for instance in stamped] + \
+              [key(instance) + ('delete', instance.company_id) for instance in deleted]
+    if not changes:
+        return
+
+    first = record_changes(session.connection(), changes, now)
+    # keep the in-memory objects in step with the stamped rows
+    for offset, instance in enumerate(stamped):
+        set_committed_value(instance, 'change_version', first + offset)
+        set_committed_value(instance, 'updated_at', now)
+
+
+def serialize(instance):
+    row = {}
+    for column in instance.__table__.columns:
+        if column.name in HIDDEN_COLUMNS:
+            continue
+        value = getattr(instance, column.name)
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        row[column.name] = value
+    return row
+
+
+def changes_since(cursor, limit):
+    """
+    Return (changes, next_cursor, has_more) for changes after `cursor`.
+
+    Rows changed several times in the page are reported once, with their
+    current contents, or as a tombstone if they no longer exist.
+    """
+    entries = ChangeLog.query.filter(ChangeLog.id > cursor) \
+        .order_by(ChangeLog.id).limit(limit + 1).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    if not entries:
+        return [], cursor, False
+
+    latest = {}
+    for entry in entries:
+        latest[(entry.table_name, entry.row_id)] = entry
+
+    rows = {}
+    for table_name, model in TRACKED.items():
+        ids = [row_id for name, row_id in latest if name == table_name]
+        if ids:
+            for instance in model.query.filter(model.id.in_(ids)):
+                rows[(table_name, instance.id)] = instance
+
+    changes = []
+    for key, entry in sorted(latest.items(), key=lambda item: item[1].id):
+        instance = rows.get(key)
+        changes.append({
+            'version': entry.id,
+            'table': entry.table_name,
+            'id': entry.row_id,
+            'operation': 'upsert' if instance is not None else 'delete',
+            'changed_at': entry.changed_at.isoformat(),
+            'row': serialize(instance) if instance is not None else None,
+        })
+    return changes, entries[-1].id, has_more
@@ -0,0 +1,305 @@
+# app/commands.py
+
+import time
+from datetime import datetime
+
+import click
+from flask import current_app
+
+from . import db, login_throttle, tenancy
+from .backfill import BACKFILLS, CHUNK_SIZE, SLEEP
+from .directory import (check as check_directory, rebuild as rebuild_directory,
+                        refresh as refresh_directory)
+from .duplicates import THRESHOLD, rebuild as rebuild_match_keys, report as duplicate_report
+from .models import BackfillProgress, Company, Employee, Offboarding
+from .offboarding import (CHUNK_SIZE as OFFBOARDING_CHUNK_SIZE, SLEEP as OFFBOARDING_SLEEP,
+                          queue as queue_offboarding, run_queue as run_offboarding)
+from .paystubs import build_period
+from .periods import overlap_report
+from .seed import seed as seed_database
+from .withholding import MissingTaxTable, fill_net_pay
+
+
+def use_company(slug):
+    try:
+        return tenancy.use(slug)
+    except KeyError:
+        raise click.BadParameter('no company with slug {!r}'.format(slug))
+
+
+def register_commands(app):
+    """
+    Attach the management commands to the app's `flask` CLI
+    """
+
+    @app.cli.command('throttle-stats')
+    def throttle_stats():
+        """Show served vs. throttled login attempts."""
+        for name, value in sorted(login_throttle.stats().items()):
+            click.echo('{}: {}'.format(name, value))
+
+    @app.cli.command('serve')
+    @click.option('--bind', default='127.0.0.1:8000', help='Address to listen on.')
+    @click.option('--workers', type=int, default=None,
+                  help='Worker processes (default: 2 x CPUs + 1).')
+    @click.option('--threads', type=int, default=4, help='Threads per worker.')
+    @click.option('--worker-class', type=click.Choice(['thread', 'gevent']),
+                  default='thread',
+                  help='Serve each request on a thread, or on a greenlet (needs gevent).')
+    @click.option('--worker-connections', type=int, default=1000,
+                  help='Requests each gevent worker serves at once.')
+    @click.option('--max-requests', type=int, default=1000,
+                  help='Recycle a worker after this many requests.')
+    @click.option('--max-requests-jitter', type=int, default=100,
+                  help='Random spread on --max-requests so workers do not recycle together.')
+    @click.option('--timeout', type=int, default=30, help='Worker timeout in seconds.')
+    @click.option('--graceful-timeout', type=int, default=30,
+                  help='Seconds a worker gets to finish requests on reload.')
+    def serve(bind, workers, threads, worker_class, worker_connections,
+              max_requests, max_requests_jitter, timeout, graceful_timeout):
+        """Run the app under a prefork multi-threaded WSGI server."""
+        from .server import Server, blocking_driver, default_workers
+
+        app = current_app._get_current_object()
+        if worker_class == 'gevent':
+            try:
+                import gevent  # the worker imports it; fail early instead
+            except ImportError:
+                raise click.UsageError('--worker-class gevent needs gevent installed.')
+            driver = blocking_driver(app)
+            if driver:
+                click.echo('Warning: the {} driver blocks gevent workers; use a pure '
+                           'Python one such as mysql+pymysql://.'.format(driver), err=True)
+        else:
+            worker_class = 'gthread' if threads > 1 else 'sync'
+
+        Server(app, {
+            'bind': bind,
+            'workers': workers or default_workers(),
+            'threads': threads,
+            'worker_class': worker_class,
+            'worker_connections': worker_connections,
+            'max_requests': max_requests,
+            'max_requests_jitter': max_requests_jitter,
+            'timeout': timeout,
+            'graceful_timeout': graceful_timeout,
+        }).run()
+
+    @app.cli.command('seed')
+    @click.option('--employees', type=int, default=1000, help='Employees to add.')
+    @click.option('--seed', 'seed_value', type=int, default=0,
+                  help='Random seed; the same seed gives the same data.')
+    @click.option('--years', type=int, default=3,
+                  help='Years of bi-weekly compensation history.')
+    @click.option('--password', default='password',
+                  help='Password shared by the generated employees.')
+    @click.option('--company', default=None,
+                  help='Slug of the company to add them to (default: the default company).')
+    def seed(employees, seed_value, years, password, company):
+        """Fill the database with synthetic employees for scale testing."""
+        if company:
+            use_company(company)
+        start = time.time()
+        employees, compensations = seed_database(employees, seed=seed_value,
+                                                 years=years, password=password)
+        click.echo('Added {} employees and {} compensation rows in {:.1f}s'.format(
+            employees, compensations, time.time() - start))
+
+    @app.cli.command('build-paystubs')
+    @click.argument('start_date')
+    @click.argument('end_date')
+    def build_paystubs(start_date, end_date):
+        """Precompute pay stubs for a finalised pay period (YYYY-MM-DD)."""
+        rendered, unchanged = build_period(
+            datetime.strptime(start_date, '%Y-%m-%d').date(),
+            datetime.strptime(end_date, '%Y-%m-%d').date())
+        click.echo('Rendered {} pay stubs, {} unchanged'.format(rendered, unchanged))
+
+    @app.cli.command('compute-net-pay')
+    @click.argument('start_date')
+    @click.argument('end_date')
+    @click.option('--overwrite', is_flag=True,
+                  help='Recalculate rows that already have a net pay.')
+    def compute_net_pay(start_date, end_date, overwrite):
+        """Withhold taxes for a pay period (YYYY-MM-DD) and fill in net pay."""
+        try:
+            updated, skipped = fill_net_pay(datetime.strptime(start_date, '%Y-%m-%d').date(),
+                                            datetime.strptime(end_date, '%Y-%m-%d').date(),
+                                            overwrite)
+        except MissingTaxTable as e:
+            raise click.UsageError(str(e))
+        click.echo('Computed net pay for {} compensation rows'.format(updated))
+        if skipped:
+            click.echo('Skipped employees in states without a withholding table: {}'.format(
+                ', '.join(str(eid) for eid in skipped)), err=True)
+
+    @app.cli.command('overlap-report')
+    def report_overlaps():
+        """List compensation periods that overlap for the same employee."""
+        found = 0
+        for earlier, later in overlap_report():
+            found += 1
+            click.echo('employee {}: compensation {} ({} to {}) overlaps {} ({} to {})'.format(
+                later.eid, later.id, later.start_date, later.end_date,
+                earlier.id, earlier.start_date, earlier.end_date))
+        click.echo('{} overlapping periods'.format(found))
+
+    @app.cli.command('add-company')
+    @click.argument('slug')
+    @click.argument('name')
+    @click.option('--shard', default=None,
+                  help='SQLALCHEMY_BINDS key of the database to keep its data in.')
+    def add_company(slug, name, shard):
+        """Register a company, optionally on its own database shard."""
+        if shard is not None:
+            if shard not in (current_app.config.get('SQLALCHEMY_BINDS') or {}):
+                raise click.BadParameter('{!r} is not in SQLALCHEMY_BINDS'.format(shard))
+            # a shard holds the full schema; this is a no-op for existing tables
+            db.Model.metadata.create_all(db.get_engine(current_app, bind=shard))
+        company = Company(slug=slug.lower(), name=name, shard=shard)
+        db.session.add(company)
+        db.session.commit()
+        click.echo('Added company {} ({}) on {}'.format(
+            company.id, company.slug, shard or 'the main database'))
+
+    @app.cli.command('rebuild-directory')
+    @click.option('--company', default=None,
+                  help='Rebuild the database holding this company (default: the main one).')
+    def rebuild_employee_directory(company):
+        """Recompute the employee directory from the tables it summarizes."""
+        if company:
+            use_company(company)
+        start = time.time()
+        written = rebuild_directory()
+        click.echo('Wrote {} directory rows in {:.1f}s'.format(written, time.time() - start))
+
+    @app.cli.command('check-directory')
+    @click.option('--company', default=None,
+                  help='Check the database holding this company (default: the main one).')
+    @click.option('--fix', is_flag=True, help='Recompute the rows found wrong.')
+    def check_employee_directory(company, fix):
+        """Report employee directory rows that are missing, stale or orphaned."""
+        if company:
+            use_company(company)
+        problems = check_directory()
+        for eid, problem in problems:
+            click.echo('employee {}: {}'.format(eid, problem))
+        click.echo('{} directory rows out of date'.format(len(problems)))
+        if problems and fix:
+            refresh_directory(db.session.connection(), [eid for eid, problem in problems])
+            db.session.commit()
+            click.echo('Fixed {} directory rows'.format(len(problems)))
+        elif problems:
+            raise SystemExit(1)
+
+    @app.cli.command('rebuild-match-keys')
+    @click.option('--company', default=None,
+                  help='Rebuild the database holding this company (default: the main one).')
+    def rebuild_employee_match_keys(company):
+        """Recompute the blocking keys duplicate detection looks employees up by."""
+        if company:
+            use_company(company)
+        start = time.time()
+        written = rebuild_match_keys()
+        click.echo('Wrote {} match keys in {:.1f}s'.format(written, time.time() - start))
+
+    @app.cli.command('duplicate-report')
+    @click.option('--threshold', type=float, default=THRESHOLD,
+                  help='Lowest match score to report, from 0 to 1.')
+    @click.option('--company', default=None,
+                  help='Check the database holding this company (default: the main one).')
+    def report_duplicates(threshold, company):
+        """List pairs of employees that are likely the same person."""
+        if company:
+            use_company(company)
+        matches = duplicate_report(threshold)
+        names = {}
+        eids = sorted(set(eid for match in matches for eid in match[1:]))
+        for i in range(0, len(eids), 500):
+            for employee in Employee.query.filter(Employee.id.in_(eids[i:i + 500])):
+                names[employee.id] = u'{} {}'.format(employee.first_name, employee.last_name)
+        for value, eid, other in matches:
+            click.echo(u'{:.0%}: employee {} ({}) and employee {} ({})'.format(
+                value, eid, names.get(eid), other, names.get(other)))
+        click.echo('{} likely duplicates'.format(len(matches)))
+
+    @app.cli.command('backfill')
+    @click.argument('name')
+    @click.option('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows per transaction.')
+    @click.option('--sleep', type=float, default=SLEEP,
+                  help='Seconds to pause between chunks, to leave room for live traffic.')
+    @click.option('--restart', is_flag=True, help='Forget earlier progress and start over.')
+    @click.option('--company', default=None,
+                  help='Run on the database holding this company (default: the main one).')
+    def run_backfill(name, chunk_size, sleep, restart, company):
+        """Fill in a column chunk by chunk, resuming where it last stopped."""
+        if name not in BACKFILLS:
+            raise click.BadParameter('no backfill named {!r}; known: {}'.format(
+                name, ', '.join(sorted(BACKFILLS)) or 'none'))
+        if company:
+            use_company(company)
+        backfill = BACKFILLS[name]
+        engine = db.session.get_bind()
+
+        def report(progress):
+            eta = '{:.0f}s'.format(progress.eta) if progress.eta is not None else '?'
+            click.echo('{}: {} rows, up to id {} of {}, {:.0f}s elapsed, ETA {}'.format(
+                progress.name, progress.rows_done, progress.last_id, progress.max_id,
+                progress.elapsed, eta))
+
+        if restart:
+            backfill.reset(engine)
+        progress = backfill.run(engine, chunk_size=chunk_size, sleep=sleep, report=report)
+        click.echo('{}: done, {} rows in total'.format(progress.name, progress.rows_done))
+
+    @app.cli.command('backfill-status')
+    def backfill_status():
+        """Show how far each backfill has got."""
+        for state in BackfillProgress.query.order_by(BackfillProgress.name):
+            click.echo('{}: {} on {}, {} rows, up to id {}, last update {}'.format(
+                state.name, 'finished' if state.finished_at else 'in progress',
+                state.table_name, state.rows_done, state.last_id, state.updated_at))
+
+    @app.cli.command('offboard')
+    @click.argument('eids', nargs=-1, type=int)
+    @click.option('--chunk-size', type=int, default=OFFBOARDING_CHUNK_SIZE,
+                  help='Rows per transaction.')
+    @click.option('--sleep', type=float, default=OFFBOARDING_SLEEP,
+                  help='Seconds to pause between chunks, to leave room for live traffic.')
+    @click.option('--queue-only', is_flag=True,
+                  help='Queue the given employees without processing the queue.')
+    @click.option('--company', default=None,
+                  help='Run on the database holding this company (default: the main one).')
+    def offboard(eids, chunk_size, sleep, queue_only, company):
+        """Queue employees for offboarding, then archive and remove everyone queued."""
+        if company:
+            use_company(company)
+        if eids:
+            queued = queue_offboarding(eids)
+            db.session.commit()
+            click.echo('Queued {} employees for offboarding'.format(len(queued)))
+        if queue_only:
+            return
+
+        def report(progress):
+            if progress.finished:
+                click.echo('employee {}: done, {} rows archived'.format(
+                    progress.eid, progress.rows_archived))
+            else:
+                click.echo('employee {}: {}, {} rows archived so far'.format(
+                    progress.eid, progress.table_name, progress.rows_archived))
+
+        start = time.time()
+        finished = run_offboarding(db.session.get_bind(), chunk_size=chunk_size,
+                                   sleep=sleep, report=report)
+        click.echo('Offboarded {} employees in {:.1f}s'.format(finished, time.time() - start))
+
+    @app.cli.command('offboarding-status')
+    def offboarding_status():
+        """List queued and finished offboardings."""
+        for state in Offboarding.query.order_by(Offboarding.requested_at, Offboarding.eid):
+            click.echo('employee {}: {}, requested {}, {} rows archived'.format(
+                state.eid,
+                'finished {}'.format(state.finished_at) if state.finished_at else
+                'in progress' if state.started_at else 'queued',
+                state.requested_at, state.rows_archived))
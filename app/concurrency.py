@@ -0,0 +1,46 @@
+# app/concurrency.py
+
+from flask import render_template
+from sqlalchemy.orm.exc import StaleDataError
+
+from . import db
+
+
+def _conflict(form, current, cancel_url):
+    """
+    Render the merge view: the submitted values next to the values saved
+    since the form was loaded. The form is re-armed with the current
+    version so submitting it again deliberately overwrites them.
+    """
+    fields = []
+    for field in form:
+        if field.name in current.__table__.columns and field.name != 'version':
+            mine, theirs = field.data, getattr(current, field.name)
+            fields.append((field.label.text, mine, theirs,
+                           unicode(mine) != unicode(theirs)))
+    form.version.data = current.version
+    return render_template('conflict.html', form=form, fields=fields,
+                           cancel_url=cancel_url, title='Edit Conflict'), 409
+
+
+def check_version(form, current, cancel_url):
+    """
+    Return a conflict response if the row changed after the form was
+    loaded, or None if the edit can go ahead
+    """
+    if unicode(form.version.data) != unicode(current.version):
+        return _conflict(form, current, cancel_url)
+    return None
+
+
+def commit_or_conflict(form, model, id, cancel_url):
+    """
+    Commit the edit. If another writer got in between the version check
+    and the UPDATE, roll back and return the conflict response instead.
+    """
+    try:
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        return _conflict(form, model.query.get_or_404(id), cancel_url)
+    return None
@@ -0,0 +1,132 @@
+# app/directory.py
+
+from flask_sqlalchemy import SignallingSession
+from sqlalchemy import event, func, inspect, select
+
+from . import db
+from .models import Employee, Payroll, Compensation, EmployeeDirectory
+from .queries import latest_compensation_id
+
+# employee ids per statement when refreshing or checking the directory
+CHUNK_SIZE = 500
+
+COLUMNS = [column.name for column in EmployeeDirectory.__table__.columns]
+
+
+def source():
+    """
+    SELECT computing directory rows, in COLUMNS order, from the tables
+    they summarize
+    """
+    employee = Employee.__table__
+    payroll = Payroll.__table__
+    compensation = Compensation.__table__
+    # nothing stops a second payroll row for an employee; use the first
+    first_payroll_id = select([func.min(Payroll.id)]) \
+        .where(Payroll.eid == Employee.id) \
+        .correlate(Employee) \
+        .as_scalar()
+    return select([
+        employee.c.id, employee.c.company_id, employee.c.first_name,
+        employee.c.last_name, employee.c.middle_name, employee.c.email,
+        employee.c.home_phone, employee.c.cell_phone, employee.c.city,
+        employee.c.state, payroll.c.account_type, payroll.c.num_allowances,
+        compensation.c.id.label('latest_compensation_id'),
+        compensation.c.start_date.label('latest_start_date'),
+        compensation.c.end_date.label('latest_end_date'),
+        compensation.c.gross_pay.label('latest_gross_pay'),
+        compensation.c.net_pay.label('latest_net_pay'),
+    ]).select_from(
+        employee
+        .outerjoin(payroll, payroll.c.id == first_payroll_id)
+        .outerjoin(compensation, compensation.c.id == latest_compensation_id()))
+
+
+def refresh(connection, eids):
+    """
+    Recompute the directory rows of the given employees, dropping those
+    of employees that no longer exist. Bulk writers that bypass the ORM
+    call this for the employees they touched.
+    """
+    table = EmployeeDirectory.__table__
+    eids = sorted(set(int(eid) for eid in eids if eid is not None))
+    for i in range(0, len(eids), CHUNK_SIZE):
+        chunk = eids[i:i + CHUNK_SIZE]
+        connection.execute(table.delete().where(table.c.id.in_(chunk)))
+        connection.execute(table.insert().from_select(
+            COLUMNS, source().where(Employee.__table__.c.id.in_(chunk))))
+
+
+@event.listens_for(SignallingSession, 'after_flush')
+def refresh_directory(session, flush_context):
+    """
+    Refresh the directory rows of every employee whose own, payroll or
+    compensation rows the flush wrote, in the same transaction
+    """
+    eids = set()
+    for instance in session.new | session.dirty | session.deleted:
+        if isinstance(instance, Employee):
+            eids.add(instance.id)
+        elif isinstance(instance, (Payroll, Compensation)):
+            # a row moved to another employee changes both of theirs
+            history = inspect(instance).attrs.eid.history
+            eids.update(list(history.deleted or ()) + [instance.eid])
+    if eids:
+        refresh(session.connection(), eids)
+
+
+def _id_ranges(connection, chunk_size):
+    employee = Employee.__table__
+    table = EmployeeDirectory.__table__
+    bounds = [connection.execute(select([func.min(t.c.id), func.max(t.c.id)])).first()
+              for t in (employee, table)]
+    lows = [low for low, high in bounds if low is not None]
+    highs = [high for low, high in bounds if high is not None]
+    if not lows:
+        return
+    for low in range(min(lows), max(highs) + 1, chunk_size):
+        yield low, low + chunk_size - 1
+
+
+def rebuild(chunk_size=CHUNK_SIZE):
+    """
+    Recompute the whole directory, a range of employee ids per
+    statement. Returns the number of rows written.
+    """
+    connection = db.session.connection()
+    table = EmployeeDirectory.__table__
+    employee = Employee.__table__
+    ranges = list(_id_ranges(connection, chunk_size))
+    connection.execute(table.delete())
+    written = 0
+    for low, high in ranges:
+        written += connection.execute(table.insert().from_select(
+            COLUMNS, source().where(employee.c.id.between(low, high)))).rowcount
+    db.session.commit()
+    return written
+
+
+def check(chunk_size=CHUNK_SIZE):
+    """
+    Compare the directory with what it should hold, a range of employee
+    ids at a time. Returns (eid, problem) pairs, where the problem is
+    'missing', 'stale' or 'orphaned'.
+    """
+    connection = db.session.connection()
+    table = EmployeeDirectory.__table__
+    employee = Employee.__table__
+    stored = select([table.c[name] for name in COLUMNS])
+    problems = []
+    for low, high in _id_ranges(connection, chunk_size):
+        expected = dict((row[0], tuple(row)) for row in connection.execute(
+            source().where(employee.c.id.between(low, high))))
+        actual = dict((row[0], tuple(row)) for row in connection.execute(
+            stored.where(table.c.id.between(low, high))))
+        for eid in sorted(set(expected) | set(actual)):
+            if eid not in actual:
+                problems.append((eid, 'missing'))
+            elif eid not in expected:
+                problems.append((eid, 'orphaned'))
+            elif actual[eid] != expected[eid]:
+                problems.append((eid, 'stale'))
+    return problems
@@ -0,0 +1,238 @@
+# app/duplicates.py
+
+import re
+from difflib import SequenceMatcher
+
+from flask_sqlalchemy import SignallingSession
+from sqlalchemy import and_, event, func, or_, select
+
+from . import db
+from .models import Employee, EmployeeMatchKey
+
+# employee ids per statement when refreshing keys or scoring pairs
+CHUNK_SIZE = 500
+
+# a pair scoring at least this is reported as a likely duplicate
+THRESHOLD = 0.6
+
+# blocks with more members than this (say, a shared office phone) are
+# too unspecific to compare exhaustively and are skipped by the report
+MAX_BLOCK = 50
+
+# candidates looked at per registration
+MAX_CANDIDATES = 50
+
+# the employee columns keys and scores are computed from
+FIELDS = ('id', 'first_name', 'last_name', 'dob', 'email', 'home_phone', 'cell_phone')
+
+SOUNDEX_CODES = dict((letter, code) for letters, code in (
+    ('bfpv', '1'), ('cgjkqsxz', '2'), ('dt', '3'), ('l', '4'), ('mn', '5'), ('r', '6'))
+    for letter in letters)
+
+
+def normalize(name):
+    return re.sub(r'[^a-z]', '', (name or '').lower())
+
+
+def digits(phone):
+    """
+    A phone number's last ten digits, or None if it has fewer than seven
+    """
+    number = re.sub(r'\D', '', unicode(phone or ''))[-10:]
+    return number if len(number) >= 7 else None
+
+
+def soundex(name):
+    """
+    American Soundex: names that sound alike, such as Smith and Smyth,
+    get the same four-character code
+    """
+    name = normalize(name)
+    if not name:
+        return None
+    code, last = name[0].upper(), SOUNDEX_CODES.get(name[0])
+    for letter in name[1:]:
+        digit = SOUNDEX_CODES.get(letter)
+        if digit and digit != last:
+            code += digit
+        # h and w don't separate letters with the same code; vowels do
+        if letter not in 'hw':
+            last = digit
+    return (code + '000')[:4]
+
+
+def blocking_keys(employee):
+    """
+    The (kind, value) keys an employee is filed under: two records of the
+    same person are very likely to share at least one
+    """
+    keys = set()
+    last, first = normalize(employee.last_name), normalize(employee.first_name)
+    dob = employee.dob.isoformat() if employee.dob else None
+    if last and dob:
+        keys.add(('name_dob', '{}|{}'.format(last, dob)))
+    if last and first and dob:
+        # spelling variants of the name, born the same year
+        keys.add(('phonetic', '{}{}|{}'.format(soundex(last), soundex(first), dob[:4])))
+    for phone in (employee.home_phone, employee.cell_phone):
+        if digits(phone):
+            keys.add(('phone', digits(phone)))
+    if employee.email and '@' in employee.email:
+        # the same mailbox name at a new domain
+        keys.add(('email', normalize(employee.email.split('@')[0])))
+    return keys
+
+
+def _similar(a, b):
+    a, b = normalize(a), normalize(b)
+    if not a or not b:
+        return 0.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def score(a, b):
+    """
+    How likely two employee records are the same person, from 0 to 1
+    """
+    total = 0.3 * _similar(a.last_name, b.last_name) + 0.2 * _similar(a.first_name, b.first_name)
+    if a.dob and a.dob == b.dob:
+        total += 0.3
+    phones = lambda employee: set(filter(None, (digits(employee.home_phone),
+                                                digits(employee.cell_phone))))
+    if phones(a) & phones(b):
+        total += 0.15
+    if a.email and b.email and \
+            normalize(a.email.split('@')[0]) == normalize(b.email.split('@')[0]):
+        total += 0.05
+    return round(total, 3)
+
+
+def refresh(connection, eids):
+    """
+    Recompute the match keys of the given employees, dropping those of
+    employees that no longer exist. Bulk writers that bypass the ORM
+    call this for the employees they touched.
+    """
+    table = EmployeeMatchKey.__table__
+    employee = Employee.__table__
+    eids = sorted(set(int(eid) for eid in eids if eid is not None))
+    for i in range(0, len(eids), CHUNK_SIZE):
+        chunk = eids[i:i + CHUNK_SIZE]
+        connection.execute(table.delete().where(table.c.eid.in_(chunk)))
+        rows = connection.execute(
+            select([employee.c[name] for name in FIELDS] + [employee.c.company_id])
+            .where(employee.c.id.in_(chunk))).fetchall()
+        keys = [{'eid': row.id, 'kind': kind, 'value': value, 'company_id': row.company_id}
+                for row in rows for kind, value in blocking_keys(row)]
+        if keys:
+            connection.execute(table.insert(), keys)
+
+
+@event.listens_for(SignallingSession, 'after_flush')
+def refile_employees(session, flush_context):
+    """
+    Refile every employee the flush wrote, in the same transaction
+    """
+    eids = set(instance.id for instance in session.new | session.dirty | session.deleted
+               if isinstance(instance, Employee))
+    if eids:
+        refresh(session.connection(), eids)
+
+
+def rebuild(chunk_size=CHUNK_SIZE):
+    """
+    Recompute every employee's match keys. Returns the number written.
+    """
+    connection = db.session.connection()
+    employee = Employee.__table__
+    connection.execute(EmployeeMatchKey.__table__.delete())
+    last = 0
+    while True:
+        eids = [eid for eid, in connection.execute(
+            select([employee.c.id]).where(employee.c.id > last)
+            .order_by(employee.c.id).limit(chunk_size))]
+        if not eids:
+            break
+        refresh(connection, eids)
+        last = eids[-1]
+    db.session.commit()
+    return db.session.query(func.count(EmployeeMatchKey.id)).scalar()
+
+
+def find_duplicates(candidate, threshold=THRESHOLD):
+    """
+    Existing employees likely to be the same person as `candidate`, an
+    Employee (or anything with the FIELDS attributes) not yet saved: a
+    seek on the match key index per blocking key, then a score for each
+    employee found. Returns (score, employee) pairs, best first.
+    """
+    keys = blocking_keys(candidate)
+    if not keys:
+        return []
+    query = db.session.query(EmployeeMatchKey.eid) \
+        .filter(or_(*[and_(EmployeeMatchKey.kind == kind, EmployeeMatchKey.value == value)
+                      for kind, value in sorted(keys)]))
+    if candidate.id is not None:
+        query = query.filter(EmployeeMatchKey.eid != candidate.id)
+    eids = [eid for eid, in query.distinct().limit(MAX_CANDIDATES)]
+    if not eids:
+        return []
+    matches = [(score(candidate, employee), employee)
+               for employee in Employee.query.filter(Employee.id.in_(eids))]
+    return sorted([match for match in matches if match[0] >= threshold],
+                  key=lambda match: (-match[0], match[1].id))
+
+
+def _blocks(connection):
+    """
+    The eids of each block of two or more employees of a company sharing
+    a key, read in one pass over the index in key order
+    """
+    table = EmployeeMatchKey.__table__
+    key_columns = [table.c.kind, table.c.value, table.c.company_id]
+    shared = select(key_columns).group_by(*key_columns) \
+        .having(and_(func.count() > 1, func.count() <= MAX_BLOCK)).alias('shared')
+    rows = connection.execute(
+        select(key_columns + [table.c.eid])
+        .select_from(table.join(shared, and_(*[column == shared.c[column.name]
+                                               for column in key_columns])))
+        .order_by(*key_columns + [table.c.eid]))
+    block, key = [], None
+    for kind, value, company_id, eid in rows:
+        if (kind, value, company_id) != key:
+            if len(block) > 1:
+                yield block
+            block, key = [], (kind, value, company_id)
+        block.append(eid)
+    if len(block) > 1:
+        yield block
+
+
+def report(threshold=THRESHOLD):
+    """
+    Every pair of employees likely to be the same person, as (score,
+    eid, other eid) tuples, best first. Only employees sharing a key are
+    compared, and blocks are capped at MAX_BLOCK, so the work grows with
+    the number of employees rather than its square.
+    """
+    connection = db.session.connection()
+    employee = Employee.__table__
+    pairs = set()
+    for block in _blocks(connection):
+        for i, eid in enumerate(block):
+            for other in block[i + 1:]:
+                pairs.add((eid, other))
+
+    rows = {}
+    needed = sorted(set(eid for pair in pairs for eid in pair))
+    for i in range(0, len(needed), CHUNK_SIZE):
+        for row in connection.execute(select([employee.c[name] for name in FIELDS])
+                                      .where(employee.c.id.in_(needed[i:i + CHUNK_SIZE]))):
+            rows[row.id] = row
+    found = []
+    for eid, other in pairs:
+        if eid in rows and other in rows:
+            value = score(rows[eid], rows[other])
+            if value >= threshold:
+                found.append((value, eid, other))
+    return sorted(found, key=lambda match: (-match[0], match[1], match[2]))
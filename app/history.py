@@ -0,0 +1,112 @@
+# app/history.py
+
+from datetime import datetime, time
+
+from flask_sqlalchemy import SignallingSession
+from sqlalchemy import event, inspect, literal, select
+
+from . import db
+from .models import Employee, EmployeeHistory, Payroll, PayrollHistory
+
+# employee ids per statement when recording versions
+CHUNK_SIZE = 500
+
+# live model -> (history model, live column holding the employee id,
+# history columns copied from a live column of another name)
+HISTORY = {
+    Employee: (EmployeeHistory, 'id', {'eid': 'id'}),
+    Payroll: (PayrollHistory, 'eid', {'payroll_id': 'id'}),
+}
+
+# history columns that aren't copies of the live row
+PERIOD = ('id', 'valid_from', 'valid_to')
+
+
+def parse_day(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _columns(model):
+    """
+    (history column, live column) names of the copied columns
+    """
+    history, owner, renamed = HISTORY[model]
+    return [(column.name, renamed.get(column.name, column.name))
+            for column in history.__table__.columns if column.name not in PERIOD]
+
+
+def record(connection, model, eids, now=None):
+    """
+    End the current versions of the given employees' rows in `model`'s
+    table and start new ones holding the rows as they are now; employees
+    whose rows are gone are only ended. Bulk writers that bypass the ORM
+    call this for the employees they touched.
+    """
+    history, owner, renamed = HISTORY[model]
+    table, live = history.__table__, model.__table__
+    now = now or datetime.utcnow()
+    columns = _columns(model)
+    snapshot = select([live.c[source] for name, source in columns] +
+                      [literal(now, type_=db.DateTime)])
+    eids = sorted(set(int(eid) for eid in eids if eid is not None))
+    for i in range(0, len(eids), CHUNK_SIZE):
+        chunk = eids[i:i + CHUNK_SIZE]
+        connection.execute(table.update()
+                           .where(table.c.eid.in_(chunk)).where(table.c.valid_to == None)
+                           .values(valid_to=now))
+        connection.execute(table.insert().from_select(
+            [name for name, source in columns] + ['valid_from'],
+            snapshot.where(live.c[owner].in_(chunk))))
+
+
+@event.listens_for(SignallingSession, 'after_flush')
+def record_versions(session, flush_context):
+    """
+    Start a new version for every employee whose personal or payroll info
+    the flush changed, in the same transaction. Writes that leave the
+    kept columns alone, such as a new password, start none.
+    """
+    now = datetime.utcnow()
+    changed = dict((model, set()) for model in HISTORY)
+    dirty = session.dirty
+    for instance in session.new | dirty | session.deleted:
+        model = next((model for model in HISTORY if isinstance(instance, model)), None)
+        if model is None:
+            continue
+        owner = HISTORY[model][1]
+        state = inspect(instance)
+        if instance in dirty and not any(
+                state.attrs[source].history.has_changes() for name, source in _columns(model)):
+            continue
+        # a row moved to another employee changes both of their histories
+        history = state.attrs[owner].history
+        changed[model].update(list(history.deleted or ()) + [getattr(instance, owner)])
+    for model, eids in sorted(changed.items(), key=lambda item: item[0].__tablename__):
+        if eids:
+            record(session.connection(), model, eids, now)
+
+
+def as_of(model, eid, moment):
+    """
+    The version of an employee's row in `model`'s table that was in
+    effect at `moment`, a UTC datetime, or at the end of the day for a
+    date; None if they had none then. A single seek on the history
+    table's (eid, valid_from) index.
+    """
+    history = HISTORY[model][0]
+    if not isinstance(moment, datetime):
+        moment = datetime.combine(moment, time.max)
+    version = history.query.filter(history.eid == eid, history.valid_from <= moment) \
+        .order_by(history.valid_from.desc(), history.id.desc()).first()
+    if version is None or (version.valid_to is not None and version.valid_to <= moment):
+        return None
+    return version
+
+
+def versions(model, eid):
+    """
+    Every version of an employee's row in `model`'s table, newest first
+    """
+    history = HISTORY[model][0]
+    return history.query.filter(history.eid == eid) \
+        .order_by(history.valid_from.desc(), history.id.desc()).all()
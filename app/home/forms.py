@@ -1,7 +1,7 @@
 # app/home/forms.py
 
 from flask_wtf import FlaskForm
-from wtforms import PasswordField, StringField, SubmitField, ValidationError, IntegerField, BooleanField, DecimalField, SelectField, DateField
+from wtforms import PasswordField, StringField, SubmitField, ValidationError, IntegerField, BooleanField, DecimalField, SelectField, DateField, HiddenField
 from wtforms.validators import DataRequired, Email, EqualTo, Length, NumberRange, AnyOf
 from ..models import Employee, Payroll, Compensation
 
@@ -32,8 +32,13 @@ class PersonalInfoForm(FlaskForm):
                                             ('WI', 'WI'), ('WY', 'WY')])
     home_phone = IntegerField('Home Phone')
     cell_phone = IntegerField('Cell Phone', validators=[DataRequired()])
+    version = HiddenField()
     submit = SubmitField('Submit')
 
+    # the columns edit views save, see app/binding.py
+    model_fields = ('first_name', 'last_name', 'middle_name', 'dob', 'email', 'street',
+                    'city', 'zip', 'state', 'home_phone', 'cell_phone')
+
 class PayrollForm(FlaskForm):
     """
     Form for admin to edit employee personal info
@@ -45,7 +50,12 @@ class PayrollForm(FlaskForm):
     amount_withheld = IntegerField('Amount Withheld', validators=[ NumberRange(min=0)])
     num_allowances = IntegerField('Number of Allowances', validators=[ NumberRange(min=0)])
     claim_exemption = BooleanField('Claim Exemption', validators=[], default=False)
+    version = HiddenField()
     submit = SubmitField('Submit')
+
+    # the columns edit views save, see app/binding.py
+    model_fields = ('account_type', 'account_num', 'routing_num', 'amount_withheld',
+                    'num_allowances', 'claim_exemption')
     
     def validate_eid(self, field):
         if Employee.query.filter_by(id=field.data).first() == None:
@@ -64,6 +74,7 @@ class CompensationForm(FlaskForm):
     gross_pay = DecimalField('Gross Pay', validators=[DataRequired()])
     hourly_wage = DecimalField('Hourly Wage', validators=[DataRequired()])
     hours_worked = DecimalField('Hours Worked', validators=[DataRequired()])
+    version = HiddenField()
     submit = SubmitField('Submit')
 
     def validate_eid(self, field):
@@ -1,12 +1,16 @@
 # app/home/views.py
 
-from flask import flash, abort, render_template, redirect, url_for
+from flask import flash, abort, make_response, render_template, redirect, request, url_for
 from flask_login import current_user, login_required
 
 from . import home
 from forms import PersonalInfoForm, PayrollForm, CompensationForm
 from .. import db
+from ..binding import update_from_form
+from ..concurrency import check_version, commit_or_conflict
 from ..models import Employee, Payroll, Compensation
+from ..paystubs import get_stub
+from ..queries import release_connection
 
 @home.route('/')
 def homepage():
@@ -30,6 +34,7 @@ def list_personalinfos():
     List personal info for this employee
     """
     personalinfos = Employee.query.filter_by(id=current_user.id).all()
+    release_connection()
     return render_template('home/personalinfos.html',
                            personalinfos=personalinfos, title='Personalinfos')
 
@@ -46,36 +51,19 @@ def edit_personalinfo(id):
     personalinfo = Employee.query.get_or_404(id)
     form = PersonalInfoForm(obj=personalinfo)
     if form.validate_on_submit():
-        personalinfo.first_name = form.first_name.data
-        personalinfo.last_name = form.last_name.data
-        personalinfo.middle_name = form.middle_name.data
-        personalinfo.dob = form.dob.data
-        personalinfo.email = form.email.data
-        personalinfo.street = form.street.data
-        personalinfo.city = form.city.data
-        personalinfo.zip = form.zip.data
-        personalinfo.state = form.state.data
-        personalinfo.home_phone = form.home_phone.data
-        personalinfo.cell_phone = form.cell_phone.data
-
-        db.session.commit()
+        conflict = check_version(form, personalinfo, url_for('home.edit_personalinfo', id=id))
+        if conflict:
+            return conflict
+
+        if update_from_form(form, personalinfo):
+            conflict = commit_or_conflict(form, Employee, id, url_for('home.edit_personalinfo', id=id))
+            if conflict:
+                return conflict
         flash('You have successfully edited the employee.')
 
         # redirect to the employee page
         return redirect(url_for('home.list_personalinfos'))
 
-    form.first_name.data = personalinfo.first_name
-    form.last_name.data = personalinfo.last_name
-    form.middle_name.data = personalinfo.middle_name
-    form.dob.data = personalinfo.dob
-    form.email.data = personalinfo.email
-    form.street.data = personalinfo.street
-    form.city.data = personalinfo.city
-    form.zip.data = personalinfo.zip
-    form.state.data = personalinfo.state
-    form.home_phone.data = personalinfo.home_phone
-    form.cell_phone.data = personalinfo.cell_phone
-
     return render_template('home/personalinfo.html', action="Edit",
                            form=form,
                            personalinfo=personalinfo, title="Edit Personal Info")
@@ -88,6 +76,7 @@ def list_payrolls():
     List payroll info for this employee
     """
     payrolls = Payroll.query.filter_by(eid=current_user.id).all()
+    release_connection()
     return render_template('home/payrolls.html',
                            payrolls=payrolls, title='Payrolls')
 
@@ -136,25 +125,19 @@ def edit_payroll(id):
     payroll = Payroll.query.get_or_404(id)
     form = PayrollForm(obj=payroll)
     if form.validate_on_submit():
-        payroll.account_type = form.account_type.data
-        payroll.account_num = form.account_num.data
-        payroll.routing_num = form.routing_num.data
-        payroll.amount_withheld = form.amount_withheld.data
-        payroll.num_allowances = form.num_allowances.data
-        payroll.claim_exemption = form.claim_exemption.data
-        db.session.add(payroll)
-        db.session.commit()
+        conflict = check_version(form, payroll, url_for('home.edit_payroll', id=id))
+        if conflict:
+            return conflict
+
+        if update_from_form(form, payroll):
+            conflict = commit_or_conflict(form, Payroll, id, url_for('home.edit_payroll', id=id))
+            if conflict:
+                return conflict
         flash('You have successfully edited the payroll info.')
 
         # redirect to the payrolls page
         return redirect(url_for('home.list_payrolls'))
 
-    form.account_type.data = payroll.account_type
-    form.account_num.data = payroll.account_num
-    form.routing_num.data = payroll.routing_num
-    form.amount_withheld.data = payroll.amount_withheld
-    form.num_allowances.data = payroll.num_allowances
-    form.claim_exemption.data = payroll.claim_exemption
     return render_template('home/payroll.html', add_payroll=add_payroll,
                            form=form, title="Edit Payroll")
 
@@ -166,10 +149,33 @@ def list_compensations():
     List compensation info for all employees
     """
     compensations = Compensation.query.filter_by(eid=current_user.id).all()
+    release_connection()
     return render_template('home/compensations.html',
                            compensations=compensations, title='Compensations')
 
 
+@home.route('/compensations/<int:id>/paystub')
+@login_required
+def paystub(id):
+    """
+    Show the pay stub for one of this employee's pay periods, served from
+    the pay stub cache. ?format=text gives a printable plain-text copy.
+    """
+    compensation = Compensation.query.get_or_404(id)
+    if compensation.eid != current_user.id:
+        abort(403)
+
+    stub = get_stub(compensation)
+
+    if request.args.get('format') == 'text':
+        response = make_response(stub.text)
+        response.headers['Content-Type'] = 'text/plain; charset=utf-8'
+        return response
+
+    return render_template('home/paystub.html', paystub=stub,
+                           compensation_id=id, title='Pay Stub')
+
+
 @home.route('/admin/dashboard')
 @login_required
 def admin_dashboard():
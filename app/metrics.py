@@ -0,0 +1,304 @@
+# app/metrics.py
+
+import fcntl
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, abort, g, request
+
+# upper bounds, in seconds, of the request latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+def pool_stats():
+    """
+    Connection pool usage of this process; pools without a fixed size,
+    such as SQLite's, report nothing
+    """
+    from . import db
+    pool = db.engine.pool
+    if not hasattr(pool, 'checkedout'):
+        return []
+    help = 'Database connections in this worker\'s pool, by state.'
+    return [('esss_db_pool_connections', 'gauge', help, {'state': 'checked_out'},
+             pool.checkedout()),
+            ('esss_db_pool_connections', 'gauge', help, {'state': 'checked_in'},
+             pool.checkedin()),
+            ('esss_db_pool_overflow', 'gauge', 'Connections opened beyond the pool size.',
+             {}, max(pool.overflow(), 0))]
+
+
+def paystub_stats():
+    from .paystubs import stats
+    help = 'Pay stub cache lookups, by result.'
+    return [('esss_paystub_cache_total', 'counter', help, {'result': 'hit'}, stats['hits']),
+            ('esss_paystub_cache_total', 'counter', help, {'result': 'miss'}, stats['misses'])]
+
+
+def admission_stats():
+    from . import admission
+    if not admission.enabled:
+        return []
+    # the pool wait averages are left out: summing them over workers means nothing
+    in_flight, shed, pool_wait = admission.stats()
+    samples = []
+    for kind in sorted(in_flight):
+        samples += [
+            ('esss_admission_in_flight', 'gauge', 'Requests being served, by admission class.',
+             {'class': kind}, in_flight[kind]),
+            ('esss_admission_shed_total', 'counter',
+             'Requests refused with a 503, by admission class.', {'class': kind}, shed[kind]),
+        ]
+    return samples
+
+
+def throttle_stats():
+    """
+    Login throttle counters; the store is shared by every worker, so
+    these are read once per scrape rather than summed
+    """
+    from . import login_throttle
+    if not login_throttle.enabled:
+        return []
+    help = 'Login attempts, by throttle decision.'
+    return [('esss_login_attempts_total', 'counter', help, {'result': name}, value)
+            for name, value in sorted(login_throttle.stats().items())]
+
+
+class Metrics(object):
+    """
+    Per-endpoint request counts, status codes and latency histograms.
+
+    Each worker process counts in memory and every few seconds writes a
+    snapshot to its own file in METRICS_DIR; the /metrics endpoint sums
+    the snapshots of every worker, so the numbers are correct whichever
+    worker answers the scrape. When a worker exits its counters are added
+    to a running total of retired workers and its file is removed, so
+    recycled workers neither pile up nor, when a pid comes round again,
+    make the counters go backwards.
+    """
+
+    def __init__(self, app=None):
+        self.requests = {}
+        self.latency = {}
+        self.process_collectors = []
+        self.collectors = []
+        self._lock = threading.Lock()
+        self._flushed = 0
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.requests = {}
+        self.latency = {}
+        self.process_collectors = [pool_stats, paystub_stats, admission_stats]
+        self.collectors = [throttle_stats]
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        self.directory = app.config.get('METRICS_DIR') or os.path.join(
+            tempfile.gettempdir(), 'esss_metrics')
+        self.interval = app.config.get('METRICS_FLUSH_INTERVAL', 5)
+        self.allow = app.config.get('METRICS_ALLOW', ('127.0.0.1',))
+        app.extensions['metrics'] = self
+        if self.enabled and not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._failed)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+
+    def _start(self):
+        if self.enabled:
+            g.metrics_start = time.time()
+
+    def _finish(self, response):
+        start = g.get('metrics_start')
+        if start is not None:
+            g.metrics_start = None
+            self.observe(request.endpoint or 'unmatched', request.method,
+                         response.status_code, time.time() - start)
+        return response
+
+    def _failed(self, exception):
+        # unhandled exceptions skip after_request handlers
+        start = g.get('metrics_start')
+        if exception is not None and start is not None:
+            self.observe(request.endpoint or 'unmatched', request.method,
+                         500, time.time() - start)
+
+    def observe(self, endpoint, method, status, seconds):
+        """
+        Count one request and add its latency to the endpoint's histogram
+        """
+        key = (endpoint, method, str(status))
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.latency.get(endpoint)
+            if histogram is None:
+                histogram = self.latency[endpoint] = [0] * (len(BUCKETS) + 1) + [0.0]
+            histogram[bisect_left(BUCKETS, seconds)] += 1
+            histogram[-1] += seconds
+        if time.time() - self._flushed > self.interval:
+            self.flush()
+
+    def _snapshot(self):
+        samples = []
+        for collect in self.process_collectors:
+            samples.extend(collect())
+        with self._lock:
+            return {
+                'requests': [list(key) + [count] for key, count in self.requests.items()],
+                'latency': dict((endpoint, list(values))
+                                for endpoint, values in self.latency.items()),
+                'samples': samples,
+            }
+
+    def _path(self, pid):
+        return os.path.join(self.directory, 'metrics-{}.json'.format(pid))
+
+    def flush(self):
+        """
+        Write this process's counters to its snapshot file
+        """
+        self._flushed = time.time()
+        pid = os.getpid()
+        if self._pid != pid:
+            # a file already there was left by an earlier process with our pid
+            self._pid = pid
+            self.retire(pid)
+        path = self._path(pid)
+        with open(path + '.tmp', 'w') as snapshot:
+            json.dump(self._snapshot(), snapshot)
+        os.rename(path + '.tmp', path)
+
+    def retire(self, pid):
+        """
+        Add the counters of an exited worker to the retired total and
+        remove its snapshot file; its gauges are dropped
+        """
+        if not self.enabled:
+            return
+        path = self._path(pid)
+        with open(os.path.join(self.directory, 'retired.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(path) as snapshot:
+                    data = json.load(snapshot)
+            except (IOError, ValueError):
+                data = None
+            if data is not None:
+                data['samples'] = [sample for sample in data.get('samples', ())
+                                   if sample[1] == 'counter']
+                requests, latency, samples = self._sum([self._retired(), data])
+                retired = os.path.join(self.directory, 'retired.json')
+                with open(retired + '.tmp', 'w') as total:
+                    json.dump({'requests': [list(key) + [count]
+                                            for key, count in requests.items()],
+                               'latency': latency,
+                               'samples': [key[:3] + (dict(key[3]), value)
+                                           for key, value in samples.items()]}, total)
+                os.rename(retired + '.tmp', retired)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _retired(self):
+        try:
+            with open(os.path.join(self.directory, 'retired.json')) as total:
+                return json.load(total)
+        except (IOError, ValueError):
+            return {'requests': [], 'latency': {}, 'samples': []}
+
+    def _sum(self, snapshots):
+        requests, latency, samples = {}, {}, {}
+        for data in snapshots:
+            for endpoint, method, status, count in data['requests']:
+                key = (endpoint, method, status)
+                requests[key] = requests.get(key, 0) + count
+            for endpoint, values in data['latency'].items():
+                total = latency.setdefault(endpoint, [0] * len(values))
+                for i, value in enumerate(values):
+                    total[i] += value
+            for name, kind, help, labels, value in data.get('samples', ()):
+                key = (name, kind, help, tuple(sorted(labels.items())))
+                samples[key] = samples.get(key, 0) + value
+        return requests, latency, samples
+
+    def aggregate(self):
+        """
+        Sum the snapshots of every live worker, including this one's live
+        counters, and the total of the retired ones
+        """
+        self.flush()
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            pid = int(os.path.basename(path)[8:-5])
+            # workers whose exit went unnoticed, say with the master killed
+            if not _alive(pid):
+                self.retire(pid)
+        snapshots = [self._retired()]
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                with open(path) as snapshot:
+                    snapshots.append(json.load(snapshot))
+            except (IOError, ValueError):
+                continue
+        requests, latency, samples = self._sum(snapshots)
+        samples = [key[:3] + (dict(key[3]), value) for key, value in sorted(samples.items())]
+        return requests, latency, samples
+
+    def render(self):
+        """
+        Render all metrics in the Prometheus text exposition format
+        """
+        requests, latency, samples = self.aggregate()
+        lines = ['# HELP esss_http_requests_total Requests served, by endpoint and status.',
+                 '# TYPE esss_http_requests_total counter']
+        for (endpoint, method, status), count in sorted(requests.items()):
+            lines.append('esss_http_requests_total{{endpoint="{}",method="{}",status="{}"}} {}'
+                         .format(endpoint, method, status, count))
+
+        lines += ['# HELP esss_http_request_duration_seconds Request latency, by endpoint.',
+                  '# TYPE esss_http_request_duration_seconds histogram']
+        for endpoint, values in sorted(latency.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), values[:-1]):
+                cumulative += count
+                lines.append('esss_http_request_duration_seconds_bucket'
+                             '{{endpoint="{}",le="{}"}} {}'.format(endpoint, bound, cumulative))
+            lines.append('esss_http_request_duration_seconds_sum{{endpoint="{}"}} {}'
+                         .format(endpoint, values[-1]))
+            lines.append('esss_http_request_duration_seconds_count{{endpoint="{}"}} {}'
+                         .format(endpoint, cumulative))
+
+        for collect in self.collectors:
+            samples.extend(collect())
+        seen = set()
+        for name, kind, help, labels, value in samples:
+            if name not in seen:
+                seen.add(name)
+                lines += ['# HELP {} {}'.format(name, help),
+                          '# TYPE {} {}'.format(name, kind)]
+            label_text = ','.join('{}="{}"'.format(k, v) for k, v in sorted(labels.items()))
+            lines.append('{}{} {}'.format(name, '{' + label_text + '}' if label_text else '',
+                                          value))
+        return '\n'.join(lines) + '\n'
+
+    def view(self):
+        if not self.enabled:
+            abort(404)
+        if request.remote_addr not in self.allow:
+            abort(403)
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
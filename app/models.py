@@ -1,7 +1,33 @@
+from flask import session
 from flask_login import UserMixin
+from sqlalchemy import DDL, event
 from werkzeug.security import generate_password_hash, check_password_hash
 
 from app import db, login_manager
+from .tenancy import DEFAULT_COMPANY_ID, current_company_id
+
+class Company(db.Model):
+    """
+    Create a Company table listing the tenants served by this deployment
+    """
+
+    __tablename__ = 'company'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # matched against the request's subdomain or X-Company header
+    slug = db.Column(db.String(60), unique=True, nullable=False)
+    name = db.Column(db.String(120), nullable=False)
+    # SQLALCHEMY_BINDS key of the database holding this company's rows,
+    # or None for the main database
+    shard = db.Column(db.String(60))
+
+    def __repr__(self):
+        return '<Company: {}>'.format(self.slug)
+
+event.listen(Company.__table__, 'after_create',
+             DDL("INSERT INTO company (id, slug, name) VALUES ({}, 'abc', 'ABC Company')"
+                 .format(DEFAULT_COMPANY_ID)))
+
 
 class Employee(UserMixin, db.Model):
     """
@@ -32,6 +58,16 @@ class Employee(UserMixin, db.Model):
     compensations = db.relationship("Compensation", back_populates="employee")
     password_hash = db.Column(db.String(128))
     is_admin = db.Column(db.Boolean, default=False)
+    # no foreign key: the company directory stays in the main database
+    # when a company's rows move to a shard
+    company_id = db.Column(db.Integer, nullable=False, index=True,
+                           server_default=str(DEFAULT_COMPANY_ID), default=current_company_id)
+    change_version = db.Column(db.BigInteger, index=True)
+    updated_at = db.Column(db.DateTime)
+    # bumped on every UPDATE; an edit based on an older version fails
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
 
     @property
     def password(self):
@@ -59,6 +95,10 @@ class Employee(UserMixin, db.Model):
 # Set up user_loader
 @login_manager.user_loader
 def load_user(user_id):
+    # ids are only unique within a database and shards number their own,
+    # so a session is only good for the company it logged in to
+    if session.get('company_id') != current_company_id():
+        return None
     return Employee.query.get(int(user_id))
 
 
@@ -77,8 +117,15 @@ class Payroll(db.Model):
     amount_withheld = db.Column(db.Integer, index=True)
     num_allowances = db.Column(db.Integer, index=True)
     claim_exemption = db.Column(db.Boolean, index=True)
-    eid = db.Column(db.Integer, db.ForeignKey('employee.id'))
+    eid = db.Column(db.Integer, db.ForeignKey('employee.id'), index=True)
     employee = db.relationship('Employee', back_populates='payroll')
+    company_id = db.Column(db.Integer, nullable=False, index=True,
+                           server_default=str(DEFAULT_COMPANY_ID), default=current_company_id)
+    change_version = db.Column(db.BigInteger, index=True)
+    updated_at = db.Column(db.DateTime)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
 
     def __repr__(self):
         return '<Payroll: {}>'.format(self.name)
@@ -89,6 +136,12 @@ class Compensation(db.Model):
     """
 
     __tablename__ = 'compensation_info'
+    __table_args__ = (
+        # finds an employee's latest compensation with a single seek
+        db.Index('ix_compensation_info_eid_end_date', 'eid', 'end_date'),
+        # neighbour seeks for overlapping pay periods, see app/periods.py
+        db.Index('ix_compensation_info_eid_period', 'eid', 'start_date', 'end_date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     start_date = db.Column(db.Date, index=True)
@@ -99,6 +152,312 @@ class Compensation(db.Model):
     hours_worked = db.Column(db.Float, index=True)
     eid = db.Column(db.Integer, db.ForeignKey('employee.id'))
     employee = db.relationship("Employee", back_populates="compensations")
+    company_id = db.Column(db.Integer, nullable=False, index=True,
+                           server_default=str(DEFAULT_COMPANY_ID), default=current_company_id)
+    change_version = db.Column(db.BigInteger, index=True)
+    updated_at = db.Column(db.DateTime)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
 
     def __repr__(self):
         return '<Compensation: {}>'.format(self.name)
+
+class EmployeeDirectory(db.Model):
+    """
+    Create an EmployeeDirectory table with one denormalized row per
+    employee for the admin list pages, kept in step with the employee,
+    payroll and compensation tables by app/directory.py
+    """
+
+    __tablename__ = 'employee_directory'
+
+    # the employee's id
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    company_id = db.Column(db.Integer, nullable=False, index=True,
+                           server_default=str(DEFAULT_COMPANY_ID))
+    first_name = db.Column(db.String(60))
+    last_name = db.Column(db.String(60), index=True)
+    middle_name = db.Column(db.String(60))
+    email = db.Column(db.String(60), index=True)
+    home_phone = db.Column(db.String(60))
+    cell_phone = db.Column(db.String(60))
+    city = db.Column(db.String(60))
+    state = db.Column(db.String(60), index=True)
+    account_type = db.Column(db.String(60))
+    num_allowances = db.Column(db.Integer)
+    latest_compensation_id = db.Column(db.Integer)
+    latest_start_date = db.Column(db.Date)
+    latest_end_date = db.Column(db.Date)
+    latest_gross_pay = db.Column(db.Float)
+    latest_net_pay = db.Column(db.Float)
+
+    def __repr__(self):
+        return '<EmployeeDirectory: {}>'.format(self.id)
+
+class EmployeeMatchKey(db.Model):
+    """
+    Create an EmployeeMatchKey table filing each employee under blocking
+    keys (name and birth date, phonetic name, phone, mailbox name), so
+    likely duplicates are found by index seeks, see app/duplicates.py
+    """
+
+    __tablename__ = 'employee_match_key'
+    __table_args__ = (
+        # candidate lookups, and the report's scan of blocks in key order
+        db.Index('ix_employee_match_key_kind_value', 'kind', 'value', 'company_id', 'eid'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    eid = db.Column(db.Integer, nullable=False, index=True)
+    kind = db.Column(db.String(10), nullable=False)
+    value = db.Column(db.String(80), nullable=False)
+    company_id = db.Column(db.Integer, nullable=False,
+                           server_default=str(DEFAULT_COMPANY_ID), default=current_company_id)
+
+    def __repr__(self):
+        return '<EmployeeMatchKey: {} {}={}>'.format(self.eid, self.kind, self.value)
+
+class EmployeeHistory(db.Model):
+    """
+    Create an EmployeeHistory table keeping every version of each
+    employee's personal info with the period it was in effect, written
+    by app/history.py whenever the employee row changes
+    """
+
+    __tablename__ = 'employee_history'
+    __table_args__ = (
+        # the version in effect at a moment is a single seek
+        db.Index('ix_employee_history_eid_valid_from', 'eid', 'valid_from'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    eid = db.Column(db.Integer, nullable=False)
+    first_name = db.Column(db.String(60))
+    last_name = db.Column(db.String(60))
+    middle_name = db.Column(db.String(60))
+    dob = db.Column(db.Date)
+    email = db.Column(db.String(60))
+    street = db.Column(db.String(60))
+    city = db.Column(db.String(60))
+    state = db.Column(db.String(60))
+    zip = db.Column(db.Integer)
+    home_phone = db.Column(db.String(60))
+    cell_phone = db.Column(db.String(60))
+    is_admin = db.Column(db.Boolean)
+    company_id = db.Column(db.Integer, nullable=False, index=True,
+                           server_default=str(DEFAULT_COMPANY_ID))
+    valid_from = db.Column(db.DateTime, nullable=False)
+    # None while the version is current
+    valid_to = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return '<EmployeeHistory: {} from {}>'.format(self.eid, self.valid_from)
+
+class PayrollHistory(db.Model):
+    """
+    Create a PayrollHistory table keeping every version of each
+    employee's payroll info with the period it was in effect
+    """
+
+    __tablename__ = 'payroll_history'
+    __table_args__ = (
+        db.Index('ix_payroll_history_eid_valid_from', 'eid', 'valid_from'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    payroll_id = db.Column(db.Integer, nullable=False)
+    account_type = db.Column(db.String(60))
+    account_num = db.Column(db.String(60))
+    routing_num = db.Column(db.String(60))
+    amount_withheld = db.Column(db.Integer)
+    num_allowances = db.Column(db.Integer)
+    claim_exemption = db.Column(db.Boolean)
+    eid = db.Column(db.Integer, nullable=False)
+    company_id = db.Column(db.Integer, nullable=False, index=True,
+                           server_default=str(DEFAULT_COMPANY_ID))
+    valid_from = db.Column(db.DateTime, nullable=False)
+    valid_to = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return '<PayrollHistory: {} from {}>'.format(self.eid, self.valid_from)
+
+class PayStub(db.Model):
+    """
+    Create a PayStub table caching rendered pay stubs per employee and period
+    """
+
+    __tablename__ = 'pay_stub'
+    __table_args__ = (
+        db.UniqueConstraint('eid', 'start_date', 'end_date', name='uq_pay_stub_period'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    eid = db.Column(db.Integer, db.ForeignKey('employee.id'))
+    start_date = db.Column(db.Date)
+    end_date = db.Column(db.Date)
+    data_version = db.Column(db.String(40))
+    html = db.Column(db.Text)
+    text = db.Column(db.Text)
+    created_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return '<PayStub: {} {}>'.format(self.eid, self.start_date)
+
+class ChangeLog(db.Model):
+    """
+    Create a ChangeLog table recording every write to the employee,
+    payroll and compensation tables, in commit order
+    """
+
+    __tablename__ = 'change_log'
+
+    # the change version, handed out by ChangeSequence
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    table_name = db.Column(db.String(30))
+    row_id = db.Column(db.Integer)
+    operation = db.Column(db.String(6))
+    changed_at = db.Column(db.DateTime)
+    company_id = db.Column(db.Integer, nullable=False, index=True,
+                           server_default=str(DEFAULT_COMPANY_ID), default=current_company_id)
+
+    def __repr__(self):
+        return '<ChangeLog: {} {} {}>'.format(self.id, self.table_name, self.row_id)
+
+class ChangeSequence(db.Model):
+    """
+    Create a single-row ChangeSequence table holding the last change version
+    """
+
+    __tablename__ = 'change_sequence'
+
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False)
+
+event.listen(ChangeSequence.__table__, 'after_create',
+             DDL('INSERT INTO change_sequence (id, value) VALUES (1, 0)'))
+
+class BackfillProgress(db.Model):
+    """
+    Create a BackfillProgress table recording how far each backfill has
+    got, so an interrupted one picks up where it stopped
+    """
+
+    __tablename__ = 'backfill_progress'
+
+    name = db.Column(db.String(120), primary_key=True)
+    table_name = db.Column(db.String(60))
+    # highest primary key already processed
+    last_id = db.Column(db.Integer)
+    rows_done = db.Column(db.Integer, nullable=False, default=0)
+    started_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return '<BackfillProgress: {} {}>'.format(self.name, self.last_id)
+
+class Offboarding(db.Model):
+    """
+    Create an Offboarding table queueing employees whose records are to
+    be archived and removed, and recording how far each removal has got
+    """
+
+    __tablename__ = 'offboarding'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # the employee's id; it outlives the employee row, and may be given
+    # to a new employee who is offboarded in turn
+    eid = db.Column(db.Integer, nullable=False, index=True)
+    company_id = db.Column(db.Integer, nullable=False, index=True,
+                           server_default=str(DEFAULT_COMPANY_ID), default=current_company_id)
+    requested_at = db.Column(db.DateTime)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime, index=True)
+    # payroll, compensation and employee rows moved to the archive so far
+    rows_archived = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return '<Offboarding: {}>'.format(self.eid)
+
+class ArchivedEmployee(db.Model):
+    """
+    Create an ArchivedEmployee table keeping the personal info of
+    offboarded employees for as long as it must be retained
+    """
+
+    __tablename__ = 'employee_archive'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # the employee's id, which a later employee may reuse
+    eid = db.Column(db.Integer, nullable=False, index=True)
+    first_name = db.Column(db.String(60))
+    last_name = db.Column(db.String(60), index=True)
+    middle_name = db.Column(db.String(60))
+    dob = db.Column(db.Date)
+    email = db.Column(db.String(60), index=True)
+    street = db.Column(db.String(60))
+    city = db.Column(db.String(60))
+    state = db.Column(db.String(60))
+    zip = db.Column(db.Integer)
+    home_phone = db.Column(db.String(60))
+    cell_phone = db.Column(db.String(60))
+    company_id = db.Column(db.Integer, nullable=False, index=True,
+                           server_default=str(DEFAULT_COMPANY_ID))
+    archived_at = db.Column(db.DateTime, index=True)
+
+    def __repr__(self):
+        return '<ArchivedEmployee: {}>'.format(self.eid)
+
+class ArchivedPayroll(db.Model):
+    """
+    Create an ArchivedPayroll table keeping the payroll info of
+    offboarded employees
+    """
+
+    __tablename__ = 'payroll_archive'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # the live row's id
+    payroll_id = db.Column(db.Integer, nullable=False, index=True)
+    account_type = db.Column(db.String(60))
+    account_num = db.Column(db.String(60))
+    routing_num = db.Column(db.String(60))
+    amount_withheld = db.Column(db.Integer)
+    num_allowances = db.Column(db.Integer)
+    claim_exemption = db.Column(db.Boolean)
+    eid = db.Column(db.Integer, index=True)
+    company_id = db.Column(db.Integer, nullable=False, index=True,
+                           server_default=str(DEFAULT_COMPANY_ID))
+    archived_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return '<ArchivedPayroll: {}>'.format(self.id)
+
+class ArchivedCompensation(db.Model):
+    """
+    Create an ArchivedCompensation table keeping the pay history of
+    offboarded employees
+    """
+
+    __tablename__ = 'compensation_archive'
+    __table_args__ = (
+        db.Index('ix_compensation_archive_eid_end_date', 'eid', 'end_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # the live row's id
+    compensation_id = db.Column(db.Integer, nullable=False, index=True)
+    start_date = db.Column(db.Date)
+    end_date = db.Column(db.Date)
+    net_pay = db.Column(db.Float)
+    gross_pay = db.Column(db.Float)
+    hourly_wage = db.Column(db.Float)
+    hours_worked = db.Column(db.Float)
+    eid = db.Column(db.Integer)
+    company_id = db.Column(db.Integer, nullable=False, index=True,
+                           server_default=str(DEFAULT_COMPANY_ID))
+    archived_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return '<ArchivedCompensation: {}>'.format(self.id)
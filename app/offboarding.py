@@ -0,0 +1,157 @@
+# app/offboarding.py
+
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import and_, literal, select
+
+from . import db
+from .changes import TRACKED, record_changes
+from .directory import refresh as refresh_directory
+from .duplicates import refresh as refresh_match_keys
+from .history import HISTORY, record as record_history
+from .models import (ArchivedCompensation, ArchivedEmployee, ArchivedPayroll, Compensation,
+                     Employee, Offboarding, Payroll, PayStub)
+
+# rows per transaction, and seconds to pause between them, unless the
+# caller says otherwise
+CHUNK_SIZE = 500
+SLEEP = 0.1
+
+# what goes, in order: (live model, archive model or None to just delete,
+# column holding the employee id). Pay stubs are renderings cached from
+# the other tables and are not kept; the employee row goes last.
+TABLES = (
+    (PayStub, None, 'eid'),
+    (Compensation, ArchivedCompensation, 'eid'),
+    (Payroll, ArchivedPayroll, 'eid'),
+    (Employee, ArchivedEmployee, 'id'),
+)
+
+# the archive column keeping the id the row had in the live table
+SOURCE_ID = {ArchivedCompensation: 'compensation_id', ArchivedPayroll: 'payroll_id',
+             ArchivedEmployee: 'eid'}
+
+Progress = namedtuple('Progress', 'eid table_name rows_archived finished')
+
+
+def queue(eids):
+    """
+    Add employees to the offboarding queue, skipping unknown ones and
+    those already waiting; an id offboarded before may belong to a new
+    employee by now. The caller commits. Returns the ids queued.
+    """
+    eids = set(int(eid) for eid in eids)
+    known = set(eid for eid, in db.session.query(Employee.id).filter(Employee.id.in_(eids)))
+    queued = set(eid for eid, in db.session.query(Offboarding.eid)
+                 .filter(Offboarding.eid.in_(eids), Offboarding.finished_at == None))
+    now = datetime.utcnow()
+    added = sorted(known - queued)
+    for eid in added:
+        db.session.add(Offboarding(eid=eid, requested_at=now))
+    return added
+
+
+def _move(connection, model, archive, key, eid, now, limit=None):
+    """
+    Copy up to `limit` of the employee's rows in `model` to `archive`,
+    delete them, publish their tombstones and end their history.
+    Returns how many went.
+    """
+    table = model.__table__
+    tracked = table.name in TRACKED
+    query = select([table.c.id, table.c.company_id] if tracked else [table.c.id]) \
+        .where(table.c[key] == eid).order_by(table.c.id)
+    rows = connection.execute(query.limit(limit) if limit else query).fetchall()
+    if not rows:
+        return 0
+    ids = [row[0] for row in rows]
+    if archive is not None:
+        columns = [column.name for column in archive.__table__.columns
+                   if column.name not in ('id', 'archived_at')]
+        source = lambda name: table.c.id if name == SOURCE_ID[archive] else table.c[name]
+        connection.execute(archive.__table__.insert().from_select(
+            columns + ['archived_at'],
+            select([source(name) for name in columns] +
+                   [literal(now, type_=db.DateTime)]).where(table.c.id.in_(ids))))
+    connection.execute(table.delete().where(table.c.id.in_(ids)))
+    if tracked:
+        record_changes(connection, [(table.name, row_id, 'delete', company_id)
+                                    for row_id, company_id in rows], now)
+    if model in HISTORY:
+        # the history is kept, ending when the rows went
+        record_history(connection, model, [eid], now)
+    return len(ids)
+
+
+def offboard(engine, eid, chunk_size=CHUNK_SIZE, sleep=SLEEP, report=None):
+    """
+    Archive and delete one queued employee's records, a chunk of rows
+    per transaction, so a long pay history never holds locks for long.
+    Progress is saved with each chunk: an interrupted run is picked up
+    by the next one. Calls `report` with a Progress after each chunk and
+    returns the final one.
+    """
+    table = Offboarding.__table__
+    this = and_(table.c.eid == eid, table.c.finished_at == None)
+    with engine.begin() as connection:
+        connection.execute(table.update().where(this).where(table.c.started_at == None)
+                           .values(started_at=datetime.utcnow()))
+        archived = connection.execute(select([table.c.rows_archived]).where(this)).scalar() or 0
+
+    children, (employee, employee_archive, employee_key) = TABLES[:-1], TABLES[-1]
+    for model, archive, key in children:
+        while True:
+            now = datetime.utcnow()
+            with engine.begin() as connection:
+                moved = _move(connection, model, archive, key, eid, now, chunk_size)
+                if archive is not None:
+                    archived += moved
+                if moved:
+                    refresh_directory(connection, [eid])
+                    connection.execute(table.update().where(this)
+                                       .values(rows_archived=archived))
+            if report is not None:
+                report(Progress(eid, model.__tablename__, archived, False))
+            if moved < chunk_size:
+                break
+            if sleep:
+                time.sleep(sleep)
+
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        # rows added while the chunks ran go along with the employee
+        for model, archive, key in children:
+            moved = _move(connection, model, archive, key, eid, now)
+            archived += moved if archive is not None else 0
+        archived += _move(connection, employee, employee_archive, employee_key, eid, now)
+        refresh_directory(connection, [eid])
+        refresh_match_keys(connection, [eid])
+        connection.execute(table.update().where(this)
+                           .values(rows_archived=archived, finished_at=now))
+    progress = Progress(eid, employee.__tablename__, archived, True)
+    if report is not None:
+        report(progress)
+    return progress
+
+
+def pending(connection):
+    """
+    The queued employees not yet offboarded, oldest request first
+    """
+    table = Offboarding.__table__
+    return [eid for eid, in connection.execute(
+        select([table.c.eid]).where(table.c.finished_at == None)
+        .order_by(table.c.requested_at, table.c.eid))]
+
+
+def run_queue(engine, chunk_size=CHUNK_SIZE, sleep=SLEEP, report=None):
+    """
+    Offboard every queued employee. Returns how many were finished.
+    """
+    with engine.connect() as connection:
+        eids = pending(connection)
+    for eid in eids:
+        offboard(engine, eid, chunk_size, sleep, report)
+    return len(eids)
@@ -0,0 +1,169 @@
+# app/paystubs.py
+
+import hashlib
+from datetime import date, datetime
+
+from flask import render_template
+from flask_sqlalchemy import SignallingSession
+from sqlalchemy import and_, event, func, inspect, or_
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .models import Employee, Payroll, Compensation, PayStub
+
+# cache hit/miss counters for this process
+stats = {'hits': 0, 'misses': 0}
+
+
+def _ytd_totals(period_end, eids):
+    """
+    Return {eid: (ytd_gross, ytd_net)} for pay periods ending in the
+    calendar year of `period_end`, up to and including it
+    """
+    rows = db.session.query(Compensation.eid,
+                            func.sum(Compensation.gross_pay),
+                            func.sum(Compensation.net_pay)) \
+        .filter(Compensation.eid.in_(eids),
+                Compensation.end_date >= date(period_end.year, 1, 1),
+                Compensation.end_date <= period_end) \
+        .group_by(Compensation.eid)
+    return dict((eid, (gross or 0, net or 0)) for eid, gross, net in rows)
+
+
+def _gather(compensations):
+    """
+    Collect everything a stub shows for each compensation row, keyed by eid
+    """
+    eids = [c.eid for c in compensations]
+    employees = dict((e.id, e) for e in Employee.query.filter(Employee.id.in_(eids)))
+    payrolls = dict((p.eid, p) for p in Payroll.query.filter(Payroll.eid.in_(eids)))
+    ytd = {}
+    for period_end in set(c.end_date for c in compensations):
+        ytd.update(_ytd_totals(period_end, [c.eid for c in compensations
+                                            if c.end_date == period_end]))
+
+    stubs = {}
+    for compensation in compensations:
+        employee = employees[compensation.eid]
+        payroll = payrolls.get(compensation.eid)
+        ytd_gross, ytd_net = ytd.get(compensation.eid, (0, 0))
+        stubs[compensation.eid] = {
+            'eid': employee.id,
+            'name': ' '.join(n for n in (employee.first_name, employee.middle_name,
+                                         employee.last_name) if n and n != 'None'),
+            'street': employee.street,
+            'city': employee.city,
+            'state': employee.state,
+            'zip': employee.zip,
+            'account_type': payroll.account_type if payroll else None,
+            'account_last4': payroll.account_num[-4:] if payroll and payroll.account_num else None,
+            'start_date': compensation.start_date,
+            'end_date': compensation.end_date,
+            'hourly_wage': compensation.hourly_wage or 0,
+            'hours_worked': compensation.hours_worked or 0,
+            'gross_pay': compensation.gross_pay or 0,
+            'net_pay': compensation.net_pay or 0,
+            'deductions': (compensation.gross_pay or 0) - (compensation.net_pay or 0),
+            'ytd_gross': ytd_gross,
+            'ytd_net': ytd_net,
+        }
+    return stubs
+
+
+def data_version(stub):
+    """
+    Fingerprint of a stub's inputs; it changes whenever any of them do
+    """
+    return hashlib.sha1(repr(sorted(stub.items()))).hexdigest()
+
+
+def _render(stub, version, paystub=None):
+    paystub = paystub or PayStub(eid=stub['eid'], start_date=stub['start_date'],
+                                 end_date=stub['end_date'])
+    paystub.data_version = version
+    paystub.html = render_template('home/paystub_body.html', stub=stub)
+    paystub.text = render_template('home/paystub.txt', stub=stub)
+    paystub.created_at = datetime.utcnow()
+    return paystub
+
+
+def build_period(start_date, end_date):
+    """
+    Precompute stubs for every employee paid for the given period,
+    re-rendering only those whose inputs changed since the last build.
+    Returns (rendered, unchanged).
+    """
+    compensations = Compensation.query.filter_by(start_date=start_date,
+                                                 end_date=end_date).all()
+    if not compensations:
+        return 0, 0
+
+    cached = dict((s.eid, s) for s in PayStub.query.filter_by(
+        start_date=start_date, end_date=end_date))
+    rendered = unchanged = 0
+    for eid, stub in _gather(compensations).items():
+        version = data_version(stub)
+        existing = cached.get(eid)
+        if existing is not None and existing.data_version == version:
+            unchanged += 1
+            continue
+        db.session.add(_render(stub, version, existing))
+        rendered += 1
+    db.session.commit()
+    return rendered, unchanged
+
+
+def get_stub(compensation):
+    """
+    Return the cached stub for a compensation row, rendering and storing
+    it if it is missing
+    """
+    period = dict(eid=compensation.eid, start_date=compensation.start_date,
+                  end_date=compensation.end_date)
+    stub = PayStub.query.filter_by(**period).first()
+    if stub is not None:
+        stats['hits'] += 1
+        return stub
+
+    stats['misses'] += 1
+    inputs = _gather([compensation])[compensation.eid]
+    stub = _render(inputs, data_version(inputs))
+    # written with a plain INSERT so the returned stub stays a detached
+    # object that doesn't have to be reloaded after the commit
+    try:
+        db.session.execute(PayStub.__table__.insert().values(
+            eid=stub.eid, start_date=stub.start_date, end_date=stub.end_date,
+            data_version=stub.data_version, html=stub.html, text=stub.text,
+            created_at=stub.created_at))
+        db.session.commit()
+    except IntegrityError:
+        # another request stored the same stub since we looked; use theirs
+        db.session.rollback()
+        return PayStub.query.filter_by(**period).first() or stub
+    return stub
+
+
+@event.listens_for(SignallingSession, 'after_flush')
+def invalidate_stubs(session, flush_context):
+    """
+    Drop cached stubs whose inputs were just changed: every stub of an
+    employee whose personal or payroll info changed, and for a changed
+    compensation the stubs for the rest of its year, whose year-to-date
+    totals include it
+    """
+    table = PayStub.__table__
+    conditions = []
+    for instance in session.new | session.dirty | session.deleted:
+        if isinstance(instance, Employee):
+            conditions.append(table.c.eid == instance.id)
+        elif isinstance(instance, Payroll):
+            conditions.append(table.c.eid == instance.eid)
+        elif isinstance(instance, Compensation):
+            # an edit may have moved the period, so also use its old end
+            history = inspect(instance).attrs.end_date.history
+            ends = [d for d in list(history.deleted or ()) + [instance.end_date] if d]
+            if ends:
+                conditions.append(and_(table.c.eid == instance.eid,
+                                       table.c.end_date >= date(min(ends).year, 1, 1)))
+    if conditions:
+        session.connection().execute(table.delete().where(or_(*conditions)))
@@ -0,0 +1,96 @@
+# app/periods.py
+
+from itertools import groupby
+
+from . import db
+from .models import Compensation
+
+# employee ids per IN (...) when checking a batch against stored periods
+IN_CHUNK = 500
+
+# Pay periods include both of their dates, so two periods overlap when
+# each starts on or before the day the other ends.
+
+
+def find_overlap(eid, start_date, end_date, exclude_id=None):
+    """
+    Return an existing compensation row of the employee's whose period
+    overlaps start_date..end_date, or None.
+
+    Periods already stored don't overlap each other, so the only one that
+    can is the latest to start on or before `end_date`: one seek down the
+    (eid, start_date, end_date) index instead of a scan of the history.
+    """
+    query = Compensation.query.filter(Compensation.eid == eid,
+                                      Compensation.start_date <= end_date)
+    if exclude_id is not None:
+        query = query.filter(Compensation.id != exclude_id)
+    neighbour = query.order_by(Compensation.start_date.desc(),
+                               Compensation.end_date.desc()).first()
+    if neighbour is not None and neighbour.end_date >= start_date:
+        return neighbour
+    return None
+
+
+def find_batch_overlaps(rows):
+    """
+    Check periods about to be bulk inserted, given as dicts with eid,
+    start_date and end_date. Returns (row, conflict) pairs, where the
+    conflict is another row of the batch or a stored Compensation.
+
+    The batch is sorted once, and stored periods are fetched with a
+    query per IN_CHUNK employees limited to the dates the batch covers.
+    """
+    overlaps = []
+    spans = {}
+    ordered = sorted(rows, key=lambda row: (row['eid'], row['start_date'], row['end_date']))
+    for eid, periods in groupby(ordered, key=lambda row: row['eid']):
+        periods = list(periods)
+        spans[eid] = (periods[0]['start_date'], max(row['end_date'] for row in periods))
+        latest = periods[0]
+        for row in periods[1:]:
+            if row['start_date'] <= latest['end_date']:
+                overlaps.append((row, latest))
+            if row['end_date'] > latest['end_date']:
+                latest = row
+    if not spans:
+        return overlaps
+
+    stored = {}
+    eids = sorted(spans)
+    first = min(start for start, end in spans.values())
+    last = max(end for start, end in spans.values())
+    for i in range(0, len(eids), IN_CHUNK):
+        for compensation in Compensation.query.filter(
+                Compensation.eid.in_(eids[i:i + IN_CHUNK]),
+                Compensation.start_date <= last, Compensation.end_date >= first):
+            stored.setdefault(compensation.eid, []).append(compensation)
+    for row in ordered:
+        for compensation in stored.get(row['eid'], ()):
+            if compensation.start_date <= row['end_date'] and \
+                    row['start_date'] <= compensation.end_date:
+                overlaps.append((row, compensation))
+    return overlaps
+
+
+def overlap_report(chunk_size=10000):
+    """
+    Yield (earlier, later) pairs of overlapping compensation rows across
+    the whole table, as (id, eid, start_date, end_date) tuples.
+
+    One pass over the table in (eid, start_date) order, which the index
+    serves directly; each row only has to be compared with the period
+    reaching furthest so far for its employee.
+    """
+    query = db.session.query(Compensation.id, Compensation.eid,
+                             Compensation.start_date, Compensation.end_date) \
+        .filter(Compensation.start_date.isnot(None), Compensation.end_date.isnot(None)) \
+        .order_by(Compensation.eid, Compensation.start_date, Compensation.end_date,
+                  Compensation.id) \
+        .yield_per(chunk_size)
+    latest = None
+    for row in query:
+        if latest is not None and latest.eid == row.eid and row.start_date <= latest.end_date:
+            yield latest, row
+        if latest is None or latest.eid != row.eid or row.end_date > latest.end_date:
+            latest = row
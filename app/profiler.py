@@ -0,0 +1,261 @@
+# app/profiler.py
+
+import glob
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from thread import get_ident
+
+from flask import request
+
+# profile names end up in file names and URLs
+NAME = re.compile(r'^[\w-]+$')
+
+# samples a second no profile may exceed, whatever is asked for
+MAX_RATE = 1000
+
+
+class Profiler(object):
+    """
+    Time-boxed sampling profiler for live workers.
+
+    While a profile runs, a thread in each worker taking part reads the
+    Python stack of every other thread a set number of times a second and
+    counts identical stacks, so the code being profiled runs unchanged. A
+    profile covers either the worker that started it, or the requests of
+    one endpoint in every worker. Workers learn of a profile from a
+    control file in PROFILER_DIR, read at most every PROFILER_POLL
+    seconds; when it ends each writes its counts next to it in the
+    collapsed-stack format that flamegraph tools read.
+
+    With no profile running the cost is a clock comparison per request,
+    and with PROFILER_ENABLED off no hooks are installed at all. Gevent
+    workers run requests on greenlets, which are not threads: there only
+    the stack that is running when a sample is taken can be seen.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.directory = None
+        self._lock = threading.Lock()
+        # the control of the profile this worker is sampling for
+        self._current = None
+        # thread ident -> endpoint of the requests being served
+        self._requests = {}
+        self._labels = {}
+        self._next_poll = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Read profiler settings from the app config
+        """
+        self.enabled = app.config.get('PROFILER_ENABLED', True)
+        self.rate = app.config.get('PROFILER_RATE', 100)
+        self.max_seconds = app.config.get('PROFILER_MAX_SECONDS', 120)
+        self.poll = app.config.get('PROFILER_POLL', 1.0)
+        self.directory = app.config.get('PROFILER_DIR') or os.path.join(
+            tempfile.gettempdir(), 'esss_profiles')
+        # stack frames are labelled with paths relative to the project
+        self.root = os.path.dirname(app.root_path) + os.sep
+        app.extensions['profiler'] = self
+        if not self.enabled:
+            return
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        app.before_request(self._start_request)
+        app.teardown_request(self._end_request)
+
+    @property
+    def _control_path(self):
+        return os.path.join(self.directory, 'control.json')
+
+    def _start_request(self):
+        now = time.time()
+        if now >= self._next_poll:
+            self._next_poll = now + self.poll
+            self._follow(self.control())
+        current = self._current
+        if current is not None and current['endpoint'] in (None, request.endpoint):
+            self._requests[get_ident()] = request.endpoint
+
+    def _end_request(self, exception):
+        if self._requests:
+            self._requests.pop(get_ident(), None)
+
+    def control(self):
+        """
+        The profile that is running, as a dict, or None
+        """
+        try:
+            with open(self._control_path) as control:
+                control = json.load(control)
+        except (IOError, ValueError):
+            return None
+        return control if control['until'] > time.time() else None
+
+    def _write_control(self, control):
+        path = self._control_path
+        if control is None:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        with open(path + '.tmp', 'w') as f:
+            json.dump(control, f)
+        os.rename(path + '.tmp', path)
+
+    def start(self, seconds, rate=None, endpoint=None):
+        """
+        Profile this worker, or the given endpoint in every worker, for up
+        to PROFILER_MAX_SECONDS. Returns the profile's name.
+        """
+        seconds = max(min(seconds, self.max_seconds), 1)
+        rate = max(min(rate or self.rate, MAX_RATE), 1)
+        name = '{:%Y%m%d-%H%M%S}-{}'.format(
+            datetime.utcnow(), endpoint.replace('.', '-') if endpoint else os.getpid())
+        control = {'name': name, 'endpoint': endpoint, 'rate': rate,
+                   'pid': None if endpoint else os.getpid(),
+                   'until': time.time() + seconds}
+        self._write_control(control)
+        self._follow(control)
+        return name
+
+    def stop(self):
+        """
+        End the running profile; other workers notice within PROFILER_POLL
+        """
+        self._write_control(None)
+        self._follow(None)
+
+    def _follow(self, control):
+        """
+        Start sampling for `control` if it concerns this worker and isn't
+        being sampled already; a running sampler stops by itself once the
+        current control is no longer its own
+        """
+        if control is not None and control['pid'] not in (None, os.getpid()):
+            control = None
+        with self._lock:
+            current = self._current
+            if control is None:
+                self._current = None
+                return
+            if current is not None and current['name'] == control['name']:
+                return
+            self._current = control
+            sampler = threading.Thread(target=self._sample, args=(control,),
+                                       name='profiler')
+            sampler.daemon = True
+            sampler.start()
+
+    def _sample(self, control):
+        counts = {}
+        me = get_ident()
+        interval = 1.0 / control['rate']
+        next_poll = time.time() + self.poll
+        try:
+            while self._current is control and time.time() < control['until']:
+                requests = self._requests
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    endpoint = requests.get(ident)
+                    if control['endpoint'] is not None and endpoint is None:
+                        continue
+                    stack = self._collapse(frame, endpoint)
+                    counts[stack] = counts.get(stack, 0) + 1
+                frame = None
+                now = time.time()
+                if now >= next_poll:
+                    # stopped, or replaced, from another worker
+                    next_poll = now + self.poll
+                    latest = self.control()
+                    if latest is None or latest['name'] != control['name']:
+                        break
+                time.sleep(interval)
+        finally:
+            self.save(control['name'], counts)
+            with self._lock:
+                if self._current is control:
+                    self._current = None
+                    self._requests.clear()
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename
+            if path.startswith(self.root):
+                path = path[len(self.root):]
+            elif 'site-packages' + os.sep in path:
+                path = path.split('site-packages' + os.sep, 1)[1]
+            else:
+                path = os.path.basename(path)
+            label = self._labels[code] = '{} ({}:{})'.format(
+                code.co_name, path, code.co_firstlineno)
+        return label
+
+    def _collapse(self, frame, endpoint):
+        """
+        A stack as one collapsed-format line, outermost frame first, under
+        the endpoint when the thread is serving a request
+        """
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        if endpoint is not None:
+            labels.append(endpoint)
+        labels.reverse()
+        return ';'.join(labels)
+
+    def save(self, name, counts):
+        """
+        Write this worker's stack counts for a profile and return the path
+        """
+        path = os.path.join(self.directory, '{}.{}.folded'.format(name, os.getpid()))
+        with open(path + '.tmp', 'w') as folded:
+            for stack, count in sorted(counts.items()):
+                folded.write('{} {}\n'.format(stack, count))
+        os.rename(path + '.tmp', path)
+        return path
+
+    def _files(self, name='*'):
+        return glob.glob(os.path.join(self.directory, '{}.*.folded'.format(name)))
+
+    def profiles(self):
+        """
+        The saved profiles, newest first, as dicts with their name, the
+        number of workers that took part and the samples they took
+        """
+        profiles = {}
+        for path in self._files():
+            name = os.path.basename(path).split('.')[0]
+            profile = profiles.setdefault(name, {'name': name, 'workers': 0, 'samples': 0})
+            profile['workers'] += 1
+            with open(path) as folded:
+                profile['samples'] += sum(int(line.rsplit(' ', 1)[1]) for line in folded)
+        return sorted(profiles.values(), key=lambda profile: profile['name'], reverse=True)
+
+    def collapsed(self, name):
+        """
+        A profile's stacks summed over its workers, in collapsed format, or
+        None if there is no such profile
+        """
+        if not NAME.match(name):
+            return None
+        paths = self._files(name)
+        if not paths:
+            return None
+        counts = {}
+        for path in paths:
+            with open(path) as folded:
+                for line in folded:
+                    stack, count = line.rsplit(' ', 1)
+                    counts[stack] = counts.get(stack, 0) + int(count)
+        return ''.join('{} {}\n'.format(stack, count) for stack, count in sorted(counts.items()))
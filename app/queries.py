@@ -0,0 +1,116 @@
+# app/queries.py
+
+from flask_sqlalchemy import Pagination
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from . import db
+from .models import Employee, Payroll, Compensation, EmployeeDirectory
+
+
+# Columns shown by the list pages. Selecting just these returns light
+# keyed tuples instead of mapped entities: no identity map entries, no
+# change tracking and no password_hash.
+EMPLOYEE_LIST_COLUMNS = (
+    Employee.id, Employee.first_name, Employee.last_name, Employee.middle_name,
+    Employee.dob, Employee.email, Employee.street, Employee.city, Employee.zip,
+    Employee.state, Employee.home_phone, Employee.cell_phone,
+)
+
+EMPLOYEE_NAME_COLUMNS = (
+    Employee.id, Employee.first_name, Employee.last_name, Employee.middle_name,
+)
+
+DIRECTORY_NAME_COLUMNS = (
+    EmployeeDirectory.id, EmployeeDirectory.first_name, EmployeeDirectory.last_name,
+    EmployeeDirectory.middle_name,
+)
+
+PAYROLL_LIST_COLUMNS = (
+    Payroll.id, Payroll.eid, Payroll.account_type, Payroll.account_num,
+    Payroll.routing_num, Payroll.amount_withheld, Payroll.num_allowances,
+    Payroll.claim_exemption,
+)
+
+
+def employee_rows(columns=EMPLOYEE_LIST_COLUMNS):
+    """
+    Query of employee rows holding only `columns`, ordered by id
+    """
+    return db.session.query(*columns).order_by(Employee.id)
+
+
+def directory_rows(columns=DIRECTORY_NAME_COLUMNS):
+    """
+    Query of employee directory rows holding only `columns`, ordered by
+    employee id
+    """
+    return db.session.query(*columns).order_by(EmployeeDirectory.id)
+
+
+def payroll_rows(columns=PAYROLL_LIST_COLUMNS):
+    """
+    Query of payroll rows holding only `columns`, ordered by employee
+    """
+    return db.session.query(*columns).order_by(Payroll.eid)
+
+
+def latest_compensation_id():
+    """
+    Correlated subquery for the id of an employee's most recent
+    compensation: the one with the latest end date, ties broken by the
+    highest id. Resolved with one seek on (eid, end_date) per employee.
+    """
+    return select([Compensation.id]) \
+        .where(Compensation.eid == Employee.id) \
+        .order_by(Compensation.end_date.desc(), Compensation.id.desc()) \
+        .limit(1) \
+        .correlate(Employee) \
+        .as_scalar()
+
+
+def employee_overview():
+    """
+    Query of (Employee, latest Compensation) pairs with each employee's
+    payroll joined in, so a page of results costs one SELECT no matter
+    how many employees it holds
+    """
+    return Employee.query \
+        .options(joinedload(Employee.payroll)) \
+        .add_entity(Compensation) \
+        .outerjoin(Compensation, Compensation.id == latest_compensation_id()) \
+        .order_by(Employee.id)
+
+
+# the most rows a caller can ask paginate() for at once
+MAX_PER_PAGE = 500
+
+
+def paginate(query, page, per_page, total_query):
+    """
+    Paginate `query`, counting rows with the cheaper `total_query`
+    instead of wrapping the full (joined) query in a COUNT. Out of range
+    page numbers and sizes are clamped, so ?per_page=-1 can't become an
+    unbounded LIMIT -1.
+    """
+    page = max(page, 1)
+    per_page = min(max(per_page, 1), MAX_PER_PAGE)
+    items = query.limit(per_page).offset((page - 1) * per_page).all()
+    return Pagination(query, page, per_page, total_query.count(), items)
+
+
+def release_connection():
+    """
+    End a read-only view's transaction once its rows are loaded, so the
+    connection goes back to the pool before the page renders rather than
+    at teardown. The transaction is committed without expiring anything,
+    so the loaded rows, current_user among them, stay in the session and
+    readable; touching anything not yet loaded checks a connection out
+    again. (Closing the session would detach them instead.)
+    """
+    session = db.session()
+    session.expire_on_commit = False
+    try:
+        session.commit()
+    finally:
+        session.expire_on_commit = True
@@ -0,0 +1,206 @@
+# app/seed.py
+
+import random
+from datetime import date, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from sqlalchemy import select
+
+from . import db
+from .admin.forms import STATES
+from .changes import record_changes
+from .directory import refresh as refresh_directory
+from .duplicates import refresh as refresh_match_keys
+from .history import record as record_history
+from .models import Employee, Payroll, Compensation
+from .periods import find_batch_overlaps
+
+FIRST_NAMES = [
+    'James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda',
+    'William', 'Elizabeth', 'David', 'Barbara', 'Richard', 'Susan', 'Joseph',
+    'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen', 'Christopher', 'Nancy',
+    'Daniel', 'Lisa', 'Matthew', 'Betty', 'Anthony', 'Margaret', 'Mark', 'Sandra',
+    'Donald', 'Ashley', 'Steven', 'Kimberly', 'Paul', 'Emily', 'Andrew', 'Donna',
+    'Joshua', 'Michelle', 'Kenneth', 'Carol', 'Kevin', 'Amanda', 'Brian', 'Melissa',
+    'George', 'Deborah', 'Timothy', 'Stephanie', 'Jose', 'Maria', 'Luis', 'Ana',
+    'Wei', 'Mei', 'Raj', 'Priya', 'Ahmed', 'Fatima',
+]
+
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+    'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson',
+    'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin', 'Lee', 'Perez', 'Thompson',
+    'White', 'Harris', 'Sanchez', 'Clark', 'Ramirez', 'Lewis', 'Robinson', 'Walker',
+    'Young', 'Allen', 'King', 'Wright', 'Scott', 'Torres', 'Nguyen', 'Hill',
+    'Flores', 'Green', 'Adams', 'Nelson', 'Baker', 'Hall', 'Rivera', 'Campbell',
+    'Mitchell', 'Carter', 'Roberts', 'Chen', 'Patel', 'Kim', 'Singh', 'Khan',
+]
+
+STREET_NAMES = [
+    'Main', 'Oak', 'Pine', 'Maple', 'Cedar', 'Elm', 'Washington', 'Lake', 'Hill',
+    'Park', 'Sunset', 'Lincoln', 'Jackson', 'Church', 'River', 'Highland', 'Mill',
+]
+
+STREET_TYPES = ['St', 'Ave', 'Blvd', 'Dr', 'Ln', 'Rd', 'Ct', 'Way']
+
+CITIES = [
+    'Springfield', 'Franklin', 'Greenville', 'Bristol', 'Clinton', 'Fairview',
+    'Salem', 'Madison', 'Georgetown', 'Arlington', 'Ashland', 'Dover', 'Oxford',
+    'Jackson', 'Burlington', 'Manchester', 'Milton', 'Newport', 'Auburn', 'Dayton',
+]
+
+# compensation rows are written in batches of this size
+BATCH_SIZE = 10000
+
+
+def _phone(rng):
+    return '{}{:03d}{:04d}'.format(rng.randint(201, 989), rng.randint(200, 999),
+                                   rng.randint(0, 9999))
+
+
+def _digits(rng, length):
+    return ''.join(str(rng.randint(0, 9)) for _ in range(length))
+
+
+def generate_employees(rng, first_id, count, password_hash):
+    """
+    Yield (employee, payroll, hire_date, hourly_wage) for `count` employees
+    """
+    for eid in range(first_id, first_id + count):
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES)
+        employee = {
+            'id': eid,
+            'first_name': first_name,
+            'last_name': last_name,
+            'middle_name': rng.choice(FIRST_NAMES) if rng.random() < 0.6 else None,
+            'dob': date(1950, 1, 1) + timedelta(days=rng.randint(0, 365 * 50)),
+            'email': '{}.{}{}@example.com'.format(first_name, last_name, eid).lower(),
+            'street': '{} {} {}'.format(rng.randint(1, 9999), rng.choice(STREET_NAMES),
+                                        rng.choice(STREET_TYPES)),
+            'city': rng.choice(CITIES),
+            'state': rng.choice(STATES),
+            'zip': rng.randint(1000, 99999),
+            'home_phone': _phone(rng) if rng.random() < 0.3 else None,
+            'cell_phone': _phone(rng),
+            'password_hash': password_hash,
+            'is_admin': False,
+        }
+        payroll = {
+            'eid': eid,
+            'account_type': rng.choice(['Checking', 'Checking', 'Savings']),
+            'account_num': _digits(rng, 9),
+            'routing_num': _digits(rng, 9),
+            'amount_withheld': rng.choice([0, 0, 0, 10, 25, 50]),
+            'num_allowances': rng.randint(0, 4),
+            'claim_exemption': rng.random() < 0.02,
+        }
+        yield employee, payroll, rng.random(), round(rng.uniform(12, 65), 2)
+
+
+def generate_compensations(rng, eid, first_period, periods, hourly_wage):
+    """
+    Yield bi-weekly compensation rows for one employee, with a raise each year
+    """
+    for period in range(periods):
+        start_date = first_period + timedelta(days=14 * period)
+        if period and period % 26 == 0:
+            hourly_wage = round(hourly_wage * rng.uniform(1.0, 1.06), 2)
+        hours_worked = round(rng.gauss(80, 4), 2)
+        gross_pay = round(hourly_wage * hours_worked, 2)
+        yield {
+            'eid': eid,
+            'start_date': start_date,
+            'end_date': start_date + timedelta(days=13),
+            'hourly_wage': hourly_wage,
+            'hours_worked': hours_worked,
+            'gross_pay': gross_pay,
+            'net_pay': round(gross_pay * (1 - rng.uniform(0.18, 0.32)), 2),
+        }
+
+
+def insert_compensations(connection, rows):
+    """
+    Bulk insert compensation rows, refusing any batch with a period that
+    overlaps another one of the same employee's
+    """
+    overlaps = find_batch_overlaps(rows)
+    if overlaps:
+        row, conflict = overlaps[0]
+        raise ValueError('Compensation for employee {} from {} to {} overlaps '
+                         'another period'.format(row['eid'], row['start_date'],
+                                                 row['end_date']))
+    connection.execute(Compensation.__table__.insert(), rows)
+
+
+def _bypassed(connection, eids):
+    """
+    Do for a batch of inserted employees what the ORM events would have:
+    refresh their directory rows and match keys, start their history and
+    publish them, their payroll info and their pay on the change feed
+    """
+    if not eids:
+        return
+    refresh_directory(connection, eids)
+    refresh_match_keys(connection, eids)
+    for model in (Employee, Payroll):
+        record_history(connection, model, eids)
+    changes = []
+    for model, key in ((Employee, 'id'), (Payroll, 'eid'), (Compensation, 'eid')):
+        table = model.__table__
+        # a batch's ids are consecutive
+        rows = connection.execute(
+            select([table.c.id, table.c.company_id])
+            .where(table.c[key].between(min(eids), max(eids))).order_by(table.c.id))
+        changes.extend((table.name, row_id, 'upsert', company_id) for row_id, company_id in rows)
+    record_changes(connection, changes)
+
+
+def seed(employees, seed=0, years=3, until=date(2017, 12, 31), password='password'):
+    """
+    Add `employees` employees, each with payroll info and up to `years`
+    years of bi-weekly compensation ending at `until`. The same seed always
+    produces the same data. Returns the number of (employees, compensations)
+    written.
+    """
+    rng = random.Random(seed)
+    first_id = (db.session.query(db.func.max(Employee.id)).scalar() or 0) + 1
+    # hashing is the slow part of creating an employee, so all seeded
+    # employees share one hash of the same password
+    password_hash = generate_password_hash(password)
+
+    periods = years * 26
+    first_period = until - timedelta(days=14 * periods - 1)
+
+    employee_rows, payroll_rows, compensation_rows = [], [], []
+    compensation_count = 0
+    connection = db.session.connection()
+    for employee, payroll, hired, hourly_wage in generate_employees(
+            rng, first_id, employees, password_hash):
+        employee_rows.append(employee)
+        payroll_rows.append(payroll)
+        # everyone has worked at least one period; some were hired mid-way
+        skipped = int(hired * hired * (periods - 1))
+        compensation_rows.extend(generate_compensations(
+            rng, employee['id'], first_period + timedelta(days=14 * skipped),
+            periods - skipped, hourly_wage))
+
+        if len(compensation_rows) >= BATCH_SIZE:
+            connection.execute(Employee.__table__.insert(), employee_rows)
+            connection.execute(Payroll.__table__.insert(), payroll_rows)
+            insert_compensations(connection, compensation_rows)
+            _bypassed(connection, [row['id'] for row in employee_rows])
+            compensation_count += len(compensation_rows)
+            employee_rows, payroll_rows, compensation_rows = [], [], []
+
+    if employee_rows:
+        connection.execute(Employee.__table__.insert(), employee_rows)
+        connection.execute(Payroll.__table__.insert(), payroll_rows)
+    if compensation_rows:
+        insert_compensations(connection, compensation_rows)
+        compensation_count += len(compensation_rows)
+    _bypassed(connection, [row['id'] for row in employee_rows])
+    db.session.commit()
+
+    return employees, compensation_count
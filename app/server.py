@@ -0,0 +1,81 @@
+# app/server.py
+
+import multiprocessing
+
+from gunicorn.app.base import BaseApplication
+
+from . import db, metrics
+
+
+# DBAPI drivers whose I/O happens in C and so blocks the whole gevent
+# worker instead of yielding to other requests
+BLOCKING_DRIVERS = ('mysqldb',)
+
+
+def default_workers():
+    """
+    Size the worker pool to the machine: two per core plus one
+    """
+    return multiprocessing.cpu_count() * 2 + 1
+
+
+def blocking_driver(app):
+    """
+    Return the name of the app's database driver if it would stall a
+    gevent worker, else None
+    """
+    with app.app_context():
+        driver = db.engine.dialect.driver
+    return driver if driver in BLOCKING_DRIVERS else None
+
+
+def post_worker_init(worker):
+    """
+    Drop any database connections inherited from the master so each
+    worker opens its own. This runs after a gevent worker has patched the
+    standard library, so the new pool waits on greenlet-aware locks.
+    """
+    app = worker.app.application
+    with app.app_context():
+        db.engine.dispose()
+
+
+def child_exit(server, worker):
+    """
+    Add an exited worker's request counters to the metrics' running total
+    and remove its snapshot, before another worker can get its pid
+    """
+    metrics.retire(worker.pid)
+
+
+class Server(BaseApplication):
+    """
+    Run the Flask app under gunicorn's prefork arbiter.
+
+    The app is loaded once in the master before forking (preload_app) so
+    workers share its memory copy-on-write. Send the master HUP to
+    gracefully restart the workers, TTIN/TTOU to grow or shrink the pool,
+    and USR2 followed by QUIT to swap in new code without dropping
+    connections.
+
+    With the gevent worker class each worker serves up to
+    worker_connections requests at once on greenlets, which wait on the
+    database without holding a thread; SQLALCHEMY_POOL_SIZE then bounds how
+    many of them are in the database at a time.
+    """
+
+    def __init__(self, application, options=None):
+        self.application = application
+        self.options = options or {}
+        super(Server, self).__init__()
+
+    def load_config(self):
+        self.cfg.set('preload_app', True)
+        self.cfg.set('post_worker_init', post_worker_init)
+        self.cfg.set('child_exit', child_exit)
+        for key, value in self.options.items():
+            if value is not None and key in self.cfg.settings:
+                self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
@@ -0,0 +1,163 @@
+# app/slowlog.py
+
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# bound parameters never written to the log, matched by bind name
+REDACTED = re.compile(r'^(password_hash|account_num|routing_num)(_\d+)?$')
+
+# how the supported databases spell "show me the plan"
+EXPLAIN = {'sqlite': 'EXPLAIN QUERY PLAN ', 'mysql': 'EXPLAIN ', 'postgresql': 'EXPLAIN '}
+
+
+class SlowQueryLog(object):
+    """
+    Record statements slower than a threshold, with their redacted
+    parameters, the endpoint that ran them and their query plan.
+
+    Entries go to a small SQLite file shared by all workers on the host
+    and only the newest SLOW_QUERY_LIMIT are kept.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS slow_query ('
+        ' id INTEGER PRIMARY KEY AUTOINCREMENT, recorded_at REAL NOT NULL,'
+        ' duration REAL NOT NULL, endpoint TEXT, statement TEXT NOT NULL,'
+        ' parameters TEXT, plan TEXT)',
+    )
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.path = None
+        self._local = threading.local()
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Read slow query log settings from the app config
+        """
+        self.enabled = app.config.get('SLOW_QUERY_ENABLED', False)
+        self.threshold = app.config.get('SLOW_QUERY_THRESHOLD', 0.25)
+        self.limit = app.config.get('SLOW_QUERY_LIMIT', 1000)
+        self.explain = app.config.get('SLOW_QUERY_EXPLAIN', True)
+        self.path = app.config.get('SLOW_QUERY_PATH') or os.path.join(
+            tempfile.gettempdir(), 'esss_slow_queries.db')
+        app.extensions['slow_query_log'] = self
+        if not self._listening:
+            # every engine, so binds added later are covered too
+            event.listen(Engine, 'before_cursor_execute', self._start_timer)
+            event.listen(Engine, 'after_cursor_execute', self._check_duration)
+            self._listening = True
+
+    def _connection(self):
+        # same arrangement as the login throttle: one connection per
+        # thread, reopened after a fork or a change of file
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.key != (os.getpid(), self.path):
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            self._local.conn = conn
+            self._local.key = (os.getpid(), self.path)
+        return conn
+
+    def _start_timer(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled:
+            conn.info['slow_query_start'] = time.time()
+
+    def _check_duration(self, conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop('slow_query_start', None)
+        if start is None:
+            return
+        duration = time.time() - start
+        if not self.enabled or duration < self.threshold:
+            return
+
+        if executemany:
+            # one row's worth is enough to reproduce the statement
+            recorded = {'rows': len(parameters), 'first': redact(parameters[0], context)}
+            plan = None
+        else:
+            recorded = redact(parameters, context)
+            plan = explain(conn, statement, parameters) if self.explain else None
+        endpoint = request.endpoint if has_request_context() else None
+        self.record(duration, statement, recorded, endpoint, plan)
+
+    def record(self, duration, statement, parameters, endpoint=None, plan=None):
+        """
+        Store one slow statement and drop entries beyond the limit
+        """
+        conn = self._connection()
+        cursor = conn.execute(
+            'INSERT INTO slow_query (recorded_at, duration, endpoint, statement,'
+            ' parameters, plan) VALUES (?, ?, ?, ?, ?, ?)',
+            (time.time(), duration, endpoint, statement,
+             json.dumps(parameters, default=unicode), plan))
+        conn.execute('DELETE FROM slow_query WHERE id <= ?',
+                     (cursor.lastrowid - self.limit,))
+
+    def entries(self, limit=100):
+        """
+        Return the newest entries as dicts, slowest first within the page
+        """
+        rows = self._connection().execute(
+            'SELECT id, recorded_at, duration, endpoint, statement, parameters, plan'
+            ' FROM slow_query ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+        keys = ('id', 'recorded_at', 'duration', 'endpoint', 'statement',
+                'parameters', 'plan')
+        entries = [dict(zip(keys, row)) for row in rows]
+        for entry in entries:
+            entry['parameters'] = json.loads(entry['parameters'])
+        return sorted(entries, key=lambda entry: -entry['duration'])
+
+    def clear(self):
+        self._connection().execute('DELETE FROM slow_query')
+
+
+def redact(parameters, context):
+    """
+    Return a copy of a statement's parameters with sensitive values
+    replaced, matching them to bind names through the compiled statement.
+    Parameters that can't be matched to a name are all redacted.
+    """
+    if isinstance(parameters, dict):
+        return dict((name, '<redacted>' if REDACTED.match(name) else value)
+                    for name, value in parameters.items())
+    compiled = getattr(context, 'compiled', None)
+    names = getattr(compiled, 'positiontup', None)
+    if names is None or len(names) != len(parameters):
+        return ['<redacted>'] * len(parameters)
+    return ['<redacted>' if REDACTED.match(name) else value
+            for name, value in zip(names, parameters)]
+
+
+def explain(conn, statement, parameters):
+    """
+    Return the plan of a SELECT as text, or None for other statements
+    """
+    prefix = EXPLAIN.get(conn.dialect.name)
+    if prefix is None or not statement.lstrip().upper().startswith('SELECT'):
+        return None
+    # a raw DBAPI cursor, so the EXPLAIN isn't itself timed and logged
+    explain_cursor = conn.connection.cursor()
+    try:
+        explain_cursor.execute(prefix + statement, parameters)
+        rows = explain_cursor.fetchall()
+    except Exception as e:
+        return 'EXPLAIN failed: {}'.format(e)
+    finally:
+        explain_cursor.close()
+    return '\n'.join(' | '.join(unicode(value) for value in row) for row in rows)
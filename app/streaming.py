@@ -0,0 +1,36 @@
+# app/streaming.py
+
+from flask import Response, current_app, get_flashed_messages, stream_with_context
+
+# rows fetched from the cursor at a time
+CHUNK_SIZE = 1000
+
+# rendered rows buffered into each chunk of the response body
+RENDER_BUFFER = 100
+
+
+def stream_rows(query, chunk_size=CHUNK_SIZE):
+    """
+    Iterate a query's rows a chunk at a time from a single cursor,
+    server-side where the driver supports it, instead of loading them all
+    """
+    return query.execution_options(stream_results=True).yield_per(chunk_size)
+
+
+def stream_template(template_name, **context):
+    """
+    Like render_template, but send the page as it renders, so the first
+    bytes go out before the last row is read and memory use doesn't grow
+    with the number of rows
+    """
+    app = current_app._get_current_object()
+    app.update_template_context(context)
+    template = app.jinja_env.get_template(template_name)
+    stream = template.stream(context)
+    stream.enable_buffering(RENDER_BUFFER)
+    body = stream_with_context(stream)
+    # The session cookie is written before the body, so take the flashed
+    # messages out of it now; the template then reads the cached copy.
+    # This has to follow stream_with_context, which reopens the session.
+    get_flashed_messages(with_categories=True)
+    return Response(body)
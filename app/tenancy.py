@@ -0,0 +1,151 @@
+# app/tenancy.py
+
+import time
+from collections import namedtuple
+
+from flask import abort, g, has_app_context, request
+from flask_sqlalchemy import SignallingSession, SQLAlchemy, get_state
+from sqlalchemy import event, select
+from sqlalchemy.orm import Query
+
+# the company every row belonged to before tenancy, and the one used
+# outside of a request (CLI commands, seeding)
+DEFAULT_COMPANY_ID = 1
+
+CompanyInfo = namedtuple('CompanyInfo', 'id slug name shard')
+
+
+def current_company():
+    """
+    The company the current request was resolved to, or None outside one
+    """
+    return g.get('company') if has_app_context() else None
+
+
+def current_company_id():
+    company = current_company()
+    return company.id if company is not None else DEFAULT_COMPANY_ID
+
+
+class TenantSession(SignallingSession):
+    """
+    Session that sends everything for a company placed on a shard to
+    that shard's database. A shard holds the whole schema, so the change
+    log and pay stub caches written alongside a company's rows stay in
+    the same transaction as them.
+    """
+
+    def get_bind(self, mapper=None, clause=None):
+        company = current_company()
+        if company is not None and company.shard is not None:
+            return get_state(self.app).db.get_engine(self.app, bind=company.shard)
+        return SignallingSession.get_bind(self, mapper, clause)
+
+
+class TenantSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return TenantSession(self, **options)
+
+    def apply_driver_hacks(self, app, info, options):
+        """
+        Also pass SQLALCHEMY_ENGINE_OPTIONS, extra create_engine()
+        arguments, when creating the main database's engine
+        """
+        main = str(info) == app.config['SQLALCHEMY_DATABASE_URI']
+        SQLAlchemy.apply_driver_hacks(self, app, info, options)
+        if main:
+            options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+
+
+@event.listens_for(Query, 'before_compile', retval=True)
+def scope_to_company(query):
+    """
+    Restrict ORM queries made during a request to the request's company.
+
+    Only the query's first tenant-scoped entity is filtered: payroll and
+    compensation rows share their employee's company, so anything joined
+    to it through `eid` is already in the same company.
+    """
+    company = current_company()
+    if company is None or query._execution_options.get('all_companies'):
+        return query
+    for description in query.column_descriptions:
+        entity = description['entity']
+        if entity is not None and hasattr(entity, 'company_id'):
+            # filtering after limit()/offset() is what we want here
+            return query.enable_assertions(False).filter(entity.company_id == company.id)
+    return query
+
+
+class Tenancy(object):
+    """
+    Resolve the company each request is for, from the TENANT_HEADER
+    header or the subdomain of TENANT_DOMAIN, falling back to
+    TENANT_DEFAULT. Companies are read from the main database and cached
+    for TENANT_CACHE_SECONDS.
+    """
+
+    def __init__(self, app=None):
+        self.companies = None
+        self._loaded = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.header = app.config.get('TENANT_HEADER', 'X-Company')
+        self.domain = app.config.get('TENANT_DOMAIN')
+        self.default = app.config.get('TENANT_DEFAULT', 'abc')
+        self.ttl = app.config.get('TENANT_CACHE_SECONDS', 60)
+        self.companies = None
+        app.extensions['tenancy'] = self
+        app.before_request(self._resolve)
+        app.teardown_request(self._forget)
+
+        @app.context_processor
+        def inject_company():
+            return {'company': current_company()}
+
+    def load(self):
+        """
+        Return {slug: CompanyInfo} for every company
+        """
+        from . import db
+        from .models import Company
+        table = Company.__table__
+        if self.companies is None or time.time() - self._loaded > self.ttl:
+            # straight from the main engine, which holds the directory:
+            # the session may be routed to a shard
+            rows = db.engine.execute(
+                select([table.c.id, table.c.slug, table.c.name, table.c.shard]))
+            self.companies = dict((row.slug, CompanyInfo(*row)) for row in rows)
+            self._loaded = time.time()
+        return self.companies
+
+    def use(self, slug):
+        """
+        Act as the given company for the rest of the app context, as a
+        request for it would; used by CLI commands
+        """
+        g.company = self.load()[slug]
+        return g.company
+
+    def slug_for(self, req):
+        slug = req.headers.get(self.header)
+        if slug:
+            return slug.lower()
+        host = req.host.split(':')[0].lower()
+        if self.domain and host.endswith('.' + self.domain):
+            return host[:-len(self.domain) - 1]
+        return self.default
+
+    def _resolve(self):
+        company = self.load().get(self.slug_for(request))
+        if company is None:
+            abort(404)
+        g.company = company
+
+    def _forget(self, exception):
+        # the app context, and so `g`, can outlive the request when one
+        # was already pushed, as in the CLI and tests
+        g.pop('company', None)
@@ -0,0 +1,144 @@
+# app/throttle.py
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+class LoginThrottle(object):
+    """
+    Token bucket throttle for login attempts, keyed per employee ID and
+    per client IP.
+
+    Bucket state lives in a small SQLite file in WAL mode so that every
+    worker process on the host shares the same buckets, and the check
+    never touches the main database or the password hasher.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS bucket ('
+        ' key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS counter ('
+        ' name TEXT PRIMARY KEY, value INTEGER NOT NULL)',
+    )
+
+    # how often (in checks per process) stale buckets are swept
+    SWEEP_EVERY = 1000
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.path = None
+        self.limits = {}
+        self._local = threading.local()
+        self._checks = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Read throttle settings from the app config
+        """
+        self.enabled = app.config.get('LOGIN_THROTTLE_ENABLED', False)
+        self.path = app.config.get('LOGIN_THROTTLE_PATH') or os.path.join(
+            tempfile.gettempdir(), 'esss_login_throttle.db')
+        self.limits = {
+            'ip': (app.config.get('LOGIN_THROTTLE_IP_RATE', 1.0),
+                   app.config.get('LOGIN_THROTTLE_IP_BURST', 20)),
+            'id': (app.config.get('LOGIN_THROTTLE_ID_RATE', 0.1),
+                   app.config.get('LOGIN_THROTTLE_ID_BURST', 5)),
+        }
+        app.extensions['login_throttle'] = self
+
+    def _connection(self):
+        # sqlite connections can't cross threads or a fork, so keep one
+        # per thread and reopen when the pid or store changes
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.key != (os.getpid(), self.path):
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            self._local.conn = conn
+            self._local.key = (os.getpid(), self.path)
+        return conn
+
+    def _take(self, conn, key, rate, burst, now):
+        row = conn.execute('SELECT tokens, updated FROM bucket WHERE key = ?',
+                           (key,)).fetchone()
+        if row is None:
+            tokens = float(burst)
+        else:
+            tokens = min(float(burst), row[0] + (now - row[1]) * rate)
+        allowed = tokens >= 1.0
+        if allowed:
+            tokens -= 1.0
+        conn.execute('INSERT OR REPLACE INTO bucket (key, tokens, updated) '
+                     'VALUES (?, ?, ?)', (key, tokens, now))
+        return allowed
+
+    def _count(self, conn, name):
+        conn.execute('INSERT OR IGNORE INTO counter (name, value) VALUES (?, 0)',
+                     (name,))
+        conn.execute('UPDATE counter SET value = value + 1 WHERE name = ?',
+                     (name,))
+
+    def allow(self, employee_id, remote_addr):
+        """
+        Take one token from the IP bucket and the employee ID bucket.
+        Return False if either bucket is empty.
+        """
+        if not self.enabled:
+            return True
+
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            outcome = 'served'
+            ip_rate, ip_burst = self.limits['ip']
+            id_rate, id_burst = self.limits['id']
+            if not self._take(conn, 'ip:{}'.format(remote_addr),
+                              ip_rate, ip_burst, now):
+                outcome = 'throttled_ip'
+            elif employee_id and not self._take(conn, 'id:{}'.format(employee_id),
+                                                id_rate, id_burst, now):
+                outcome = 'throttled_id'
+            self._count(conn, outcome)
+            self._sweep(conn, now)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return outcome == 'served'
+
+    def _sweep(self, conn, now):
+        # a bucket untouched long enough to refill completely is the
+        # same as a missing one, so it can be dropped
+        self._checks += 1
+        if self._checks % self.SWEEP_EVERY:
+            return
+        refill = max(float(burst) / rate for rate, burst in self.limits.values())
+        conn.execute('DELETE FROM bucket WHERE updated < ?', (now - refill,))
+
+    def stats(self):
+        """
+        Return the served/throttled attempt counters shared by all workers
+        """
+        counts = {'served': 0, 'throttled_ip': 0, 'throttled_id': 0}
+        if self.path is None:
+            return counts
+        for name, value in self._connection().execute(
+                'SELECT name, value FROM counter'):
+            counts[name] = value
+        return counts
+
+    def reset(self):
+        """
+        Clear all buckets and counters
+        """
+        conn = self._connection()
+        conn.execute('DELETE FROM bucket')
+        conn.execute('DELETE FROM counter')
@@ -0,0 +1,217 @@
+# app/withholding.py
+
+import glob
+import json
+import os
+from bisect import bisect_right
+from collections import namedtuple
+
+from . import db
+from .models import Employee, Payroll, Compensation
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'withholding')
+
+# pay frequencies, in periods per year, that a pay period is rounded to
+FREQUENCIES = (52, 26, 24, 12)
+
+Withholding = namedtuple('Withholding', 'federal state total version')
+
+
+class MissingTaxTable(ValueError):
+    """
+    There are no tables to withhold with for a tax year or a state
+    """
+
+
+class Schedule(object):
+    """
+    A bracket table compiled for lookups: sorted thresholds, the tax owed
+    at each threshold and the marginal rate above it
+    """
+
+    def __init__(self, brackets, allowance):
+        self.thresholds = [float(low) for low, rate in brackets]
+        self.rates = [rate for low, rate in brackets]
+        self.allowance = allowance
+        self.base = [0.0]
+        for i in range(1, len(brackets)):
+            self.base.append(self.base[-1] + (self.thresholds[i] - self.thresholds[i - 1])
+                             * self.rates[i - 1])
+
+    def annual_tax(self, income):
+        if income <= 0:
+            return 0.0
+        i = bisect_right(self.thresholds, income) - 1
+        return self.base[i] + (income - self.thresholds[i]) * self.rates[i]
+
+
+class TaxTables(object):
+    """
+    The federal and state schedules for one tax year
+    """
+
+    def __init__(self, data):
+        self.year = data['year']
+        self.version = data['version']
+        federal = data['federal']
+        self.federal = dict((status, Schedule(brackets, federal['allowance']))
+                            for status, brackets in federal['brackets'].items())
+        # None marks a state without income tax; absent states have no
+        # table yet, and nothing is calculated for them
+        self.states = dict((state, Schedule(table['brackets'], table['allowance'])
+                            if table else None)
+                           for state, table in data['states'].items())
+
+
+# compiled tables by year, loaded once per process
+_tables = {}
+
+
+def available_years():
+    return sorted(int(os.path.basename(path)[:-5])
+                  for path in glob.glob(os.path.join(DATA_DIR, '*.json')))
+
+
+def tables_for(year):
+    """
+    Return the compiled tables for a tax year. Rates change every year,
+    so a year without its own file raises MissingTaxTable rather than
+    borrowing another year's.
+    """
+    tables = _tables.get(year)
+    if tables is None:
+        if year not in available_years():
+            raise MissingTaxTable('There are no withholding tables for {}.'.format(year))
+        with open(os.path.join(DATA_DIR, '{}.json'.format(year))) as data:
+            tables = _tables[year] = TaxTables(json.load(data))
+    return tables
+
+
+def check_tables(year, state):
+    """
+    Raise MissingTaxTable unless withholding can be calculated for a
+    state in a tax year. States known to have no income tax can.
+    """
+    if state not in tables_for(year).states:
+        raise MissingTaxTable('There is no withholding table for {}.'.format(
+            state or 'an employee without a state'))
+
+
+def periods_per_year(start_date, end_date):
+    """
+    Round a pay period to the nearest standard pay frequency
+    """
+    per_year = 365.0 / ((end_date - start_date).days + 1)
+    return min(FREQUENCIES, key=lambda frequency: abs(frequency - per_year))
+
+
+def withhold(gross_pay, periods, year, state=None, allowances=0, exempt=False,
+             additional=0, status='single'):
+    """
+    Return the Withholding for one pay period's gross pay, using the
+    percentage method: annualise the pay, take off allowances, look up
+    the annual tax and divide it back over the year. Raises
+    MissingTaxTable for a state or year there are no tables for.
+    """
+    check_tables(year, state)
+    tables = tables_for(year)
+    annual = (gross_pay or 0) * periods
+    allowances = allowances or 0
+
+    federal = 0.0
+    if not exempt:
+        schedule = tables.federal[status]
+        federal = schedule.annual_tax(annual - allowances * schedule.allowance) / periods
+    federal = round(federal + (additional or 0), 2)
+
+    state_tax = 0.0
+    schedule = tables.states.get(state)
+    if schedule is not None:
+        state_tax = round(schedule.annual_tax(annual - allowances * schedule.allowance)
+                          / periods, 2)
+    return Withholding(federal, state_tax, round(federal + state_tax, 2), tables.version)
+
+
+def withhold_many(rows, year, status='single'):
+    """
+    Withholding for a whole pay run. `rows` are (gross_pay, periods,
+    state, allowances, exempt, additional) tuples; returns the list of
+    total amounts withheld, in the same order, with None for rows in a
+    state there is no table for.
+
+    The schedules are looked up once for the run rather than per row.
+    """
+    tables = tables_for(year)
+    federal = tables.federal[status]
+    states = tables.states
+    federal_tax = federal.annual_tax
+    federal_allowance = federal.allowance
+
+    totals = []
+    append = totals.append
+    for gross_pay, periods, state, allowances, exempt, additional in rows:
+        if state not in states:
+            append(None)
+            continue
+        annual = (gross_pay or 0) * periods
+        allowances = allowances or 0
+        amount = (additional or 0) if exempt else \
+            federal_tax(annual - allowances * federal_allowance) / periods + (additional or 0)
+        schedule = states.get(state)
+        if schedule is not None:
+            amount = round(amount, 2) + round(
+                schedule.annual_tax(annual - allowances * schedule.allowance) / periods, 2)
+        append(round(amount, 2))
+    return totals
+
+
+def _inputs(compensation, employee, payroll):
+    return (compensation.gross_pay, periods_per_year(compensation.start_date,
+                                                     compensation.end_date),
+            employee.state if employee else None,
+            payroll.num_allowances if payroll else 0,
+            payroll.claim_exemption if payroll else False,
+            payroll.amount_withheld if payroll else 0)
+
+
+def net_pay(compensation):
+    """
+    Net pay for a compensation row from its gross pay and the employee's
+    state and W-4 details on their payroll info
+    """
+    employee = Employee.query.get(compensation.eid)
+    payroll = Payroll.query.filter_by(eid=compensation.eid).first()
+    gross_pay, periods, state, allowances, exempt, additional = \
+        _inputs(compensation, employee, payroll)
+    withheld = withhold(float(gross_pay or 0), periods, compensation.end_date.year, state,
+                        allowances, exempt, additional)
+    return round(float(gross_pay or 0) - withheld.total, 2)
+
+
+def fill_net_pay(start_date, end_date, overwrite=False):
+    """
+    Compute net pay for every compensation row in a pay period that
+    doesn't have one yet (or all of them with `overwrite`). Rows of
+    employees in a state without a table are left alone. Returns the
+    number of rows updated and the sorted ids of the employees skipped.
+    """
+    query = db.session.query(Compensation, Employee, Payroll) \
+        .join(Employee, Employee.id == Compensation.eid) \
+        .outerjoin(Payroll, Payroll.eid == Compensation.eid) \
+        .filter(Compensation.start_date == start_date,
+                Compensation.end_date == end_date)
+    if not overwrite:
+        query = query.filter(Compensation.net_pay.is_(None))
+    rows = query.all()
+    if not rows:
+        return 0, []
+
+    totals = withhold_many([_inputs(*row) for row in rows], end_date.year)
+    skipped = set()
+    for (compensation, employee, payroll), withheld in zip(rows, totals):
+        if withheld is None:
+            skipped.add(employee.id)
+            continue
+        compensation.net_pay = round((compensation.gross_pay or 0) - withheld, 2)
+    db.session.commit()
+    return len(rows) - sum(1 for withheld in totals if withheld is None), sorted(skipped)
@@ -0,0 +1,111 @@
+# benchmarks/admission_overload.py
+"""
+Overload `flask serve` with clients on an expensive self-service page
+while one admin keeps using the admin pages, with admission control on
+and off. With it off every request queues and the admin waits behind the
+crowd; with it on the surplus is refused at once with a 503 (counted as
+refused below) and the latency of admitted requests, the admin's
+included, stays close to that of an idle server.
+
+The app runs on a seeded SQLite file, whose pool has no fixed size, so
+only the per-worker ADMISSION_LIMITS come into play here.
+
+Usage: python benchmarks/admission_overload.py --clients 64 --seconds 10
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from serve_concurrency import hammer, login, percentile
+from serve_throughput import wait_until_up
+
+SERVER = '''
+import sys
+sys.path.insert(0, {root!r})
+from app import admission, create_app
+from app.server import Server
+app = create_app('testing')
+app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///' + {path!r})
+if not {enabled!r}:
+    # the hooks are installed by now; with no limits nothing is refused
+    admission.limits.clear()
+Server(app, {options!r}).run()
+'''
+
+
+def populate(path, employees):
+    from app import create_app, db
+    from app.models import Employee
+    from app.seed import seed
+
+    app = create_app('testing')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///' + path)
+    with app.app_context():
+        db.create_all()
+        seed(employees, years=1)
+        # the one the benchmark logs in as also uses the admin pages
+        Employee.query.get(1).is_admin = True
+        db.session.commit()
+
+
+def run(enabled, path, port, args):
+    options = {'bind': '127.0.0.1:{}'.format(port), 'workers': args.workers,
+               'worker_class': 'gthread', 'threads': 8}
+    process = subprocess.Popen(
+        [sys.executable, '-c', SERVER.format(root=ROOT, path=path, options=options,
+                                             enabled=enabled)],
+        cwd=ROOT, stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+    base = 'http://127.0.0.1:{}'.format(port)
+    try:
+        wait_until_up(base + '/')
+        cookie = login(base)
+        results = {}
+
+        def admin():
+            results['admin'] = hammer(base + args.admin_path, cookie, 1, args.seconds)
+
+        admin_thread = threading.Thread(target=admin)
+        admin_thread.start()
+        crowd, refused = hammer(base + args.path, cookie, args.clients, args.seconds)
+        admin_thread.join()
+        admin_latencies, admin_errors = results['admin']
+        print('{:<10} {:>10.1f} {:>10.1f} {:>10.1f} {:>8} {:>12.1f} {:>12.1f}'.format(
+            'on' if enabled else 'off', len(crowd) / float(args.seconds),
+            percentile(crowd, 0.5) * 1000, percentile(crowd, 0.99) * 1000, refused,
+            percentile(admin_latencies, 0.5) * 1000, percentile(admin_latencies, 0.99) * 1000))
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--seconds', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--employees', type=int, default=1000)
+    parser.add_argument('--path', default='/compensations')
+    parser.add_argument('--admin-path', default='/admin/payrolls')
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        populate(path, args.employees)
+        print('{:<10} {:>10} {:>10} {:>10} {:>8} {:>12} {:>12}'.format(
+            'admission', 'ok req/s', 'p50 ms', 'p99 ms', 'refused', 'admin p50', 'admin p99'))
+        for port, enabled in enumerate((False, True), 5005):
+            run(enabled, path, port, args)
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
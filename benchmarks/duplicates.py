@@ -0,0 +1,76 @@
+# benchmarks/duplicates.py
+"""
+Compare duplicate detection through the blocking key index with scoring
+every employee, as the employee count doubles: an indexed lookup should
+stay flat and the whole-table report grow about linearly, where the scan
+grows with the count and a pairwise report with its square.
+
+Usage: python benchmarks/duplicates.py --employees 2000 --doublings 3
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import create_app, db
+from app.duplicates import THRESHOLD, find_duplicates, report, score
+from app.models import Employee
+from app.seed import seed
+
+LOOKUPS = 50
+
+
+def measure(employees):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    app = create_app('testing')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///' + path)
+    try:
+        with app.app_context():
+            db.create_all()
+            seed(employees, seed=1, years=0)
+            candidates = Employee.query.order_by(Employee.id).limit(LOOKUPS).all()
+            for candidate in candidates:
+                db.session.expunge(candidate)
+                candidate.id = None
+
+            start = time.time()
+            for candidate in candidates:
+                find_duplicates(candidate)
+            indexed = (time.time() - start) / LOOKUPS
+
+            start = time.time()
+            for candidate in candidates[:5]:
+                [e for e in Employee.query if score(candidate, e) >= THRESHOLD]
+            scanned = (time.time() - start) / 5
+
+            start = time.time()
+            pairs = len(report())
+            reported = time.time() - start
+        return indexed, scanned, reported, pairs
+    finally:
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--employees', type=int, default=2000)
+    parser.add_argument('--doublings', type=int, default=3)
+    args = parser.parse_args()
+
+    print('{:>10} {:>14} {:>14} {:>12} {:>8}'.format(
+        'employees', 'index lookup', 'full scan', 'report', 'pairs'))
+    for step in range(args.doublings + 1):
+        employees = args.employees * 2 ** step
+        indexed, scanned, reported, pairs = measure(employees)
+        print('{:>10} {:>11.2f} ms {:>11.2f} ms {:>10.2f} s {:>8}'.format(
+            employees, indexed * 1000, scanned * 1000, reported, pairs))
+
+
+if __name__ == '__main__':
+    main()
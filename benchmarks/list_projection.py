@@ -0,0 +1,105 @@
+# benchmarks/list_projection.py
+"""
+Compare loading and rendering the admin list pages from full ORM
+entities (Query.all()) against column-projected rows.
+
+Each case runs in a fresh process so its peak RSS is its own.
+
+Usage: python benchmarks/list_projection.py --rows 10000
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import create_app, db
+from app.models import Employee, Payroll
+from app.queries import EMPLOYEE_NAME_COLUMNS, employee_rows, payroll_rows
+
+
+CASES = [
+    ('personalinfos', 'admin/personalinfos/personalinfos.html', 'personalinfos',
+     lambda: Employee.query.all(), lambda: employee_rows().all()),
+    ('payrolls', 'admin/payrolls/payrolls.html', 'payrolls',
+     lambda: Payroll.query.all(), lambda: payroll_rows().all()),
+    ('selectemployee', 'admin/compensations/selectemployee.html', 'employees',
+     lambda: Employee.query.all(),
+     lambda: employee_rows(EMPLOYEE_NAME_COLUMNS).all()),
+]
+
+
+def make_app(path):
+    app = create_app('testing')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///' + path)
+    return app
+
+
+def populate(path, rows):
+    app = make_app(path)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(Employee.__table__.insert(), [
+            {'id': eid, 'first_name': 'First', 'last_name': 'Last',
+             'middle_name': 'Middle', 'email': '{}@example.com'.format(eid),
+             'street': '1 Main St', 'city': 'Austin', 'state': 'TX',
+             'zip': 78701, 'home_phone': '5125550100', 'cell_phone': '5125550101',
+             'password_hash': 'pbkdf2:sha1:1000$salt$' + '0' * 40}
+            for eid in range(1, rows + 1)])
+        db.session.execute(Payroll.__table__.insert(), [
+            {'eid': eid, 'account_type': 'Checking', 'account_num': '123456789',
+             'routing_num': '123456789', 'amount_withheld': 0,
+             'num_allowances': 1, 'claim_exemption': False}
+            for eid in range(1, rows + 1)])
+        db.session.commit()
+
+
+def measure(path, case, mode, results):
+    from flask import render_template
+
+    name, template, variable, load_orm, load_rows = case
+    app = make_app(path)
+    with app.test_request_context():
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.time()
+        rows = load_orm() if mode == 'orm' else load_rows()
+        loaded = time.time()
+        render_template(template, title=name, **{variable: rows})
+        rendered = time.time()
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((loaded - start, rendered - loaded, (after - before) / 1024.0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        populate(path, args.rows)
+        print('{:<16} {:<8} {:>10} {:>10} {:>12}'.format(
+            'page', 'mode', 'load ms', 'render ms', 'peak MB'))
+        for case in CASES:
+            for mode in ('orm', 'columns'):
+                results = multiprocessing.Queue()
+                process = multiprocessing.Process(
+                    target=measure, args=(path, case, mode, results))
+                process.start()
+                load, render, peak = results.get()
+                process.join()
+                print('{:<16} {:<8} {:>10.1f} {:>10.1f} {:>12.1f}'.format(
+                    case[0], mode, load * 1000, render * 1000, peak))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+# benchmarks/serve_concurrency.py
+"""
+Compare latency under rising concurrency of `flask serve` with threaded
+workers against gevent workers, on a self-service page that waits on the
+database. The app runs on a seeded SQLite file; the threaded server
+serves at most workers x threads requests at a time, while the gevent
+server takes every connection and interleaves them on greenlets.
+
+The gevent case needs gevent installed.
+
+Usage: python benchmarks/serve_concurrency.py --clients 16,64,256
+"""
+
+import argparse
+import cookielib
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib
+import urllib2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from serve_throughput import wait_until_up
+
+SERVER = '''
+import sys
+sys.path.insert(0, {root!r})
+from app import admission, create_app
+from app.server import Server
+app = create_app('testing')
+app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///' + {path!r},
+                  METRICS_ENABLED=False)
+# admission control's hooks are installed by now, so ADMISSION_ENABLED
+# would come too late; with no limits nothing is refused or left unmeasured
+admission.limits.clear()
+Server(app, {options!r}).run()
+'''
+
+MODES = [
+    ('thread', {'worker_class': 'gthread', 'threads': 8}),
+    ('gevent', {'worker_class': 'gevent', 'worker_connections': 1000}),
+]
+
+
+def populate(path, employees):
+    from app import create_app, db
+    from app.seed import seed
+
+    app = create_app('testing')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///' + path)
+    with app.app_context():
+        db.create_all()
+        seed(employees, years=1)
+
+
+def login(base):
+    """
+    Log the first seeded employee in; return their session cookie
+    """
+    jar = cookielib.CookieJar()
+    opener = urllib2.build_opener(urllib2.HTTPCookieProcessor(jar))
+    opener.open(base + '/login', urllib.urlencode({'id': 1, 'password': 'password'}))
+    return '; '.join('{}={}'.format(cookie.name, cookie.value) for cookie in jar)
+
+
+def hammer(url, cookie, clients, seconds):
+    """
+    Hit url from `clients` threads for `seconds`; return the latencies of
+    the successful requests and the number of errors
+    """
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop = time.time() + seconds
+
+    def client():
+        mine, failed = [], 0
+        request = urllib2.Request(url, headers={'Cookie': cookie})
+        while time.time() < stop:
+            start = time.time()
+            try:
+                urllib2.urlopen(request, timeout=30).read()
+                mine.append(time.time() - start)
+            except Exception:
+                failed += 1
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), errors[0]
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else 0
+
+
+def run(name, options, path, port, args):
+    options = dict(options, bind='127.0.0.1:{}'.format(port), workers=args.workers)
+    process = subprocess.Popen(
+        [sys.executable, '-c', SERVER.format(root=ROOT, path=path, options=options)],
+        cwd=ROOT, stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+    base = 'http://127.0.0.1:{}'.format(port)
+    try:
+        wait_until_up(base + '/')
+        cookie = login(base)
+        for clients in args.clients:
+            latencies, errors = hammer(base + args.path, cookie, clients, args.seconds)
+            print('{:<8} {:>8} {:>10.1f} {:>10.1f} {:>10.1f} {:>8}'.format(
+                name, clients, len(latencies) / float(args.seconds),
+                percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000,
+                errors))
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', default='16,64,256',
+                        type=lambda value: [int(n) for n in value.split(',')])
+    parser.add_argument('--seconds', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--employees', type=int, default=1000)
+    parser.add_argument('--path', default='/compensations')
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        populate(path, args.employees)
+        print('{:<8} {:>8} {:>10} {:>10} {:>10} {:>8}'.format(
+            'mode', 'clients', 'req/s', 'p50 ms', 'p99 ms', 'errors'))
+        for port, (name, options) in enumerate(MODES, 5003):
+            if name == 'gevent':
+                try:
+                    import gevent
+                except ImportError:
+                    print('gevent   (skipped: gevent is not installed)')
+                    continue
+            run(name, options, path, port, args)
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
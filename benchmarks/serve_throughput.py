@@ -0,0 +1,89 @@
+# benchmarks/serve_throughput.py
+"""
+Compare request throughput of the development server (run.py) with the
+prefork `flask serve` entry point.
+
+Usage: FLASK_CONFIG=production python benchmarks/serve_throughput.py
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_until_up(url, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib2.urlopen(url, timeout=1).read()
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError('server at {} did not start'.format(url))
+
+
+def hammer(url, clients, seconds):
+    """
+    Hit url from `clients` threads for `seconds`; return (requests, errors)
+    """
+    counts = {'ok': 0, 'error': 0}
+    lock = threading.Lock()
+    stop = time.time() + seconds
+
+    def client():
+        ok = error = 0
+        while time.time() < stop:
+            try:
+                urllib2.urlopen(url, timeout=10).read()
+                ok += 1
+            except Exception:
+                error += 1
+        with lock:
+            counts['ok'] += ok
+            counts['error'] += error
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts['ok'], counts['error']
+
+
+def run(name, command, port, args):
+    env = dict(os.environ, FLASK_APP='run.py',
+               FLASK_CONFIG=os.environ.get('FLASK_CONFIG', 'production'))
+    process = subprocess.Popen(command, cwd=ROOT, env=env,
+                               stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+    url = 'http://127.0.0.1:{}{}'.format(port, args.path)
+    try:
+        wait_until_up(url)
+        ok, errors = hammer(url, args.clients, args.seconds)
+    finally:
+        process.terminate()
+        process.wait()
+    print('{:<12} {:>10.1f} req/s  ({} ok, {} errors)'.format(
+        name, ok / float(args.seconds), ok, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=int, default=10)
+    parser.add_argument('--path', default='/')
+    args = parser.parse_args()
+
+    run('run.py', [sys.executable, '-c',
+                   'from run import app; app.run(port=5001)'], 5001, args)
+    run('flask serve', [sys.executable, '-m', 'flask', 'serve',
+                        '--bind', '127.0.0.1:5002'], 5002, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/streamed_lists.py
+"""
+Compare rendering the admin personal info and payroll tables in one
+piece (render_template over Query.all()) against streaming them
+(stream_template over a yield_per cursor): time to the first chunk of
+the body, total time and peak RSS.
+
+Each case runs in a fresh process so its peak RSS is its own.
+
+Usage: python benchmarks/streamed_lists.py --rows 50000
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import create_app, db
+from app.queries import employee_rows, payroll_rows
+
+from list_projection import populate
+
+
+CASES = [
+    ('personalinfos', 'admin/personalinfos/personalinfos.html', 'personalinfos',
+     employee_rows),
+    ('payrolls', 'admin/payrolls/payrolls.html', 'payrolls', payroll_rows),
+]
+
+
+def make_app(path):
+    app = create_app('testing')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///' + path)
+    return app
+
+
+def measure(path, case, mode, results):
+    from flask import render_template
+    from app.streaming import stream_rows, stream_template
+
+    name, template, variable, rows = case
+    app = make_app(path)
+    with app.test_request_context():
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.time()
+        if mode == 'whole':
+            body = iter([render_template(template, title=name,
+                                         **{variable: rows().all()})])
+        else:
+            body = iter(stream_template(template, title=name,
+                                        **{variable: stream_rows(rows())}).response)
+        next(body)
+        first = time.time()
+        for chunk in body:
+            pass
+        done = time.time()
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((first - start, done - start, (after - before) / 1024.0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=50000)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        populate(path, args.rows)
+        print('{:<16} {:<8} {:>12} {:>10} {:>12}'.format(
+            'page', 'mode', 'first ms', 'total ms', 'peak MB'))
+        for case in CASES:
+            for mode in ('whole', 'streamed'):
+                results = multiprocessing.Queue()
+                process = multiprocessing.Process(
+                    target=measure, args=(path, case, mode, results))
+                process.start()
+                first, total, peak = results.get()
+                process.join()
+                print('{:<16} {:<8} {:>12.1f} {:>10.1f} {:>12.1f}'.format(
+                    case[0], mode, first * 1000, total * 1000, peak))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
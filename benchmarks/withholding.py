@@ -0,0 +1,55 @@
+# benchmarks/withholding.py
+"""
+Time withholding calculations for a synthetic population, one call at a
+time through withhold() and as a pay run through withhold_many().
+
+Usage: python benchmarks/withholding.py --count 1000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.withholding import tables_for, withhold, withhold_many
+
+
+def population(count, states, seed=0):
+    rng = random.Random(seed)
+    return [(round(rng.uniform(200, 12000), 2), rng.choice((52, 26, 24, 12)),
+             rng.choice(states), rng.randint(0, 5), rng.random() < 0.02,
+             rng.choice((0, 0, 0, 25)))
+            for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=1000000)
+    parser.add_argument('--year', type=int, default=2017)
+    args = parser.parse_args()
+
+    start = time.time()
+    tables = tables_for(args.year)
+    print('load tables:    {:>8.1f} ms'.format((time.time() - start) * 1000))
+    # only states withhold() can calculate: the others raise MissingTaxTable
+    rows = population(args.count, sorted(tables.states))
+
+    start = time.time()
+    single = [withhold(gross, periods, args.year, state, allowances, exempt, extra).total
+              for gross, periods, state, allowances, exempt, extra in rows]
+    elapsed = time.time() - start
+    print('withhold():     {:>8.2f} s  ({:.0f}/s)'.format(elapsed, args.count / elapsed))
+
+    start = time.time()
+    batch = withhold_many(rows, args.year)
+    elapsed = time.time() - start
+    print('withhold_many(): {:>7.2f} s  ({:.0f}/s)'.format(elapsed, args.count / elapsed))
+    assert single == batch
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,7 @@
 # config.py
 
+import os
+
 class Config(object):
     """
     Common configurations
@@ -7,6 +9,61 @@ class Config(object):
 
     DEBUG = True
 
+    # proxies (load balancers) in front of the app; with one or more, the
+    # client address the login throttle and METRICS_ALLOW go by is taken
+    # from X-Forwarded-For. Leave at 0 unless every request comes through
+    # them, or clients could claim any address.
+    PROXY_COUNT = 0
+
+    # login throttling (token buckets shared by all workers on the host)
+    LOGIN_THROTTLE_ENABLED = True
+    LOGIN_THROTTLE_PATH = None
+    LOGIN_THROTTLE_IP_RATE = 1.0
+    LOGIN_THROTTLE_IP_BURST = 20
+    LOGIN_THROTTLE_ID_RATE = 0.1
+    LOGIN_THROTTLE_ID_BURST = 5
+
+    # request metrics (per-worker snapshots summed by /metrics)
+    METRICS_ENABLED = True
+    METRICS_DIR = None
+    METRICS_FLUSH_INTERVAL = 5
+    METRICS_ALLOW = ('127.0.0.1',)
+
+    # slow query log (ring buffer shared by all workers on the host)
+    SLOW_QUERY_ENABLED = True
+    SLOW_QUERY_THRESHOLD = 0.25
+    SLOW_QUERY_LIMIT = 1000
+    SLOW_QUERY_EXPLAIN = True
+    SLOW_QUERY_PATH = None
+
+    # admission control (per worker): requests beyond a class's limit, or
+    # arriving while the pool is exhausted and their class has been
+    # waiting on it, get a 503; admin and login pages are never refused.
+    # Keep the limits below the pool size so those always get a connection.
+    ADMISSION_ENABLED = True
+    ADMISSION_LIMITS = {'expensive': 2, 'default': 8}
+    ADMISSION_EXPENSIVE = ('home.list_compensations', 'home.paystub',
+                           'api.employee_overview_list', 'api.list_changes')
+    ADMISSION_PRIORITY_BLUEPRINTS = ('admin', 'auth')
+    ADMISSION_MAX_POOL_WAIT = 0.5
+    ADMISSION_RETRY_AFTER = 2
+
+    # sampling profiler, started from the admin area (profiles and their
+    # control file are shared by all workers on the host)
+    PROFILER_ENABLED = True
+    PROFILER_DIR = None
+    PROFILER_RATE = 100
+    PROFILER_MAX_SECONDS = 120
+    PROFILER_POLL = 1.0
+
+    # tenancy: the company is taken from this header, else the subdomain
+    # of TENANT_DOMAIN, else TENANT_DEFAULT. Companies placed on a shard
+    # name a key of SQLALCHEMY_BINDS.
+    TENANT_HEADER = 'X-Company'
+    TENANT_DOMAIN = None
+    TENANT_DEFAULT = 'abc'
+    TENANT_CACHE_SECONDS = 60
+
 class DevelopmentConfig(Config):
     """
     Development configurations
@@ -29,6 +86,16 @@ class TestingConfig(Config):
     """
 
     TESTING = True
+    WTF_CSRF_ENABLED = False
+    # tests.py runs the suite on SQLite, in memory or, when
+    # TEST_DATABASE_PATH is set, in a file per test process ({worker} in
+    # the path is replaced by the process id). TEST_DATABASE_URI runs it
+    # on another database, such as a MySQL test database, instead.
+    TEST_DATABASE_PATH = os.environ.get('TEST_DATABASE_PATH', ':memory:')
+    TEST_DATABASE_URI = os.environ.get('TEST_DATABASE_URI')
+    LOGIN_THROTTLE_ENABLED = False
+    METRICS_ENABLED = False
+    SLOW_QUERY_ENABLED = False
 
 app_config = {
     'development': DevelopmentConfig,
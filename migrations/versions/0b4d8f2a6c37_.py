@@ -0,0 +1,141 @@
+"""give the offboarding and archive tables their own primary keys
+
+Revision ID: 0b4d8f2a6c37
+Revises: f3a7c1e9d205
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b4d8f2a6c37'
+down_revision = 'f3a7c1e9d205'
+branch_labels = None
+depends_on = None
+
+# Live ids get reused, so the employee, payroll or compensation id a row
+# was copied from becomes a plain indexed column. Each table is renamed
+# out of the way, recreated and refilled, which every backend supports.
+
+
+def employee_columns():
+    return [
+        sa.Column('first_name', sa.String(length=60), nullable=True),
+        sa.Column('last_name', sa.String(length=60), nullable=True),
+        sa.Column('middle_name', sa.String(length=60), nullable=True),
+        sa.Column('dob', sa.Date(), nullable=True),
+        sa.Column('email', sa.String(length=60), nullable=True),
+        sa.Column('street', sa.String(length=60), nullable=True),
+        sa.Column('city', sa.String(length=60), nullable=True),
+        sa.Column('state', sa.String(length=60), nullable=True),
+        sa.Column('zip', sa.Integer(), nullable=True),
+        sa.Column('home_phone', sa.String(length=60), nullable=True),
+        sa.Column('cell_phone', sa.String(length=60), nullable=True),
+        sa.Column('company_id', sa.Integer(), server_default='1', nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+    ]
+
+
+def payroll_columns():
+    return [
+        sa.Column('account_type', sa.String(length=60), nullable=True),
+        sa.Column('account_num', sa.String(length=60), nullable=True),
+        sa.Column('routing_num', sa.String(length=60), nullable=True),
+        sa.Column('amount_withheld', sa.Integer(), nullable=True),
+        sa.Column('num_allowances', sa.Integer(), nullable=True),
+        sa.Column('claim_exemption', sa.Boolean(), nullable=True),
+        sa.Column('eid', sa.Integer(), nullable=True),
+        sa.Column('company_id', sa.Integer(), server_default='1', nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+    ]
+
+
+def compensation_columns():
+    return [
+        sa.Column('start_date', sa.Date(), nullable=True),
+        sa.Column('end_date', sa.Date(), nullable=True),
+        sa.Column('net_pay', sa.Float(), nullable=True),
+        sa.Column('gross_pay', sa.Float(), nullable=True),
+        sa.Column('hourly_wage', sa.Float(), nullable=True),
+        sa.Column('hours_worked', sa.Float(), nullable=True),
+        sa.Column('eid', sa.Integer(), nullable=True),
+        sa.Column('company_id', sa.Integer(), server_default='1', nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+    ]
+
+
+def offboarding_columns():
+    return [
+        sa.Column('company_id', sa.Integer(), server_default='1', nullable=False),
+        sa.Column('requested_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('rows_archived', sa.Integer(), nullable=False),
+    ]
+
+
+# table: (columns, the column holding the source id after the upgrade,
+# indexed columns before, indexed columns after, other indexes)
+TABLES = [
+    ('offboarding', offboarding_columns, 'eid',
+     ['company_id', 'finished_at'], ['eid', 'company_id', 'finished_at'], {}),
+    ('employee_archive', employee_columns, 'eid',
+     ['last_name', 'email', 'company_id', 'archived_at'],
+     ['eid', 'last_name', 'email', 'company_id', 'archived_at'], {}),
+    ('payroll_archive', payroll_columns, 'payroll_id',
+     ['eid', 'company_id'], ['payroll_id', 'eid', 'company_id'], {}),
+    ('compensation_archive', compensation_columns, 'compensation_id',
+     ['company_id'], ['compensation_id', 'company_id'],
+     {'ix_compensation_archive_eid_end_date': ['eid', 'end_date']}),
+]
+
+
+def rebuild(name, columns, key, old_indexes, new_indexes, others, upgrading):
+    """
+    Recreate `name` with or without a surrogate id and copy its rows over;
+    downgrading keeps only the latest row for each source id
+    """
+    for column in old_indexes if upgrading else new_indexes:
+        op.drop_index(op.f('ix_{}_{}'.format(name, column)), table_name=name)
+    for index in others:
+        op.drop_index(index, table_name=name)
+    op.rename_table(name, name + '_old')
+
+    names = [column.name for column in columns()]
+    if upgrading:
+        op.create_table(name, *[
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column(key, sa.Integer(), nullable=False)] + columns() + [
+            sa.PrimaryKeyConstraint('id')])
+        # offboarding was keyed by eid already, the archives by id
+        source = 'eid' if name == 'offboarding' else 'id'
+        copy = 'INSERT INTO {0} ({1}, {2}) SELECT {3}, {2} FROM {0}_old ORDER BY {3}'.format(
+            name, key, ', '.join(c for c in names if c != key), source)
+    else:
+        source = 'eid' if name == 'offboarding' else 'id'
+        op.create_table(name, *[
+            sa.Column(source, sa.Integer(), autoincrement=False, nullable=False)] +
+            [column for column in columns() if column.name != source] + [
+            sa.PrimaryKeyConstraint(source)])
+        copy = ('INSERT INTO {0} ({3}, {2}) SELECT {1}, {2} FROM {0}_old '
+                'WHERE id IN (SELECT max(id) FROM {0}_old GROUP BY {1})').format(
+            name, key, ', '.join(c for c in names if c != source), source)
+    op.execute(copy)
+    op.drop_table(name + '_old')
+
+    for column in new_indexes if upgrading else old_indexes:
+        op.create_index(op.f('ix_{}_{}'.format(name, column)), name, [column], unique=False)
+    for index, indexed in others.items():
+        op.create_index(index, name, indexed, unique=False)
+
+
+def upgrade():
+    for table in TABLES:
+        rebuild(*table, upgrading=True)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        rebuild(*table, upgrading=False)
@@ -0,0 +1,40 @@
+"""add companies and a company to every tenant-owned row
+
+Revision ID: 3f7d9b2c6e14
+Revises: 6a8c0f3e2b91
+Create Date: 2026-10-19 20:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f7d9b2c6e14'
+down_revision = '6a8c0f3e2b91'
+branch_labels = None
+depends_on = None
+
+TABLES = ('employee', 'payroll_info', 'compensation_info', 'change_log')
+
+
+def upgrade():
+    company = op.create_table('company',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('slug', sa.String(length=60), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.Column('shard', sa.String(length=60), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('slug')
+    )
+    op.bulk_insert(company, [{'id': 1, 'slug': 'abc', 'name': 'ABC Company'}])
+    for table in TABLES:
+        op.add_column(table, sa.Column('company_id', sa.Integer(), server_default='1', nullable=False))
+        op.create_index(op.f('ix_{}_company_id'.format(table)), table, ['company_id'], unique=False)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_index(op.f('ix_{}_company_id'.format(table)), table_name=table)
+        op.drop_column(table, 'company_id')
+    op.drop_table('company')
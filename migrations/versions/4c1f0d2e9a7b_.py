@@ -0,0 +1,36 @@
+"""add pay stub cache
+
+Revision ID: 4c1f0d2e9a7b
+Revises: b5350e4f7e8a
+Create Date: 2026-10-19 18:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c1f0d2e9a7b'
+down_revision = 'b5350e4f7e8a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('pay_stub',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('eid', sa.Integer(), nullable=True),
+    sa.Column('start_date', sa.Date(), nullable=True),
+    sa.Column('end_date', sa.Date(), nullable=True),
+    sa.Column('data_version', sa.String(length=40), nullable=True),
+    sa.Column('html', sa.Text(), nullable=True),
+    sa.Column('text', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['eid'], ['employee.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('eid', 'start_date', 'end_date', name='uq_pay_stub_period')
+    )
+
+
+def downgrade():
+    op.drop_table('pay_stub')
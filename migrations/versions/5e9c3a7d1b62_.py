@@ -0,0 +1,33 @@
+"""add backfill progress tracking
+
+Revision ID: 5e9c3a7d1b62
+Revises: a1c5e8d2f407
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e9c3a7d1b62'
+down_revision = 'a1c5e8d2f407'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('backfill_progress',
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.Column('table_name', sa.String(length=60), nullable=True),
+    sa.Column('last_id', sa.Integer(), nullable=True),
+    sa.Column('rows_done', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('backfill_progress')
@@ -0,0 +1,25 @@
+"""index compensation periods for overlap checks
+
+Revision ID: 6a8c0f3e2b91
+Revises: d7b3e5a1f20c
+Create Date: 2026-10-19 20:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a8c0f3e2b91'
+down_revision = 'd7b3e5a1f20c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_compensation_info_eid_period', 'compensation_info',
+                    ['eid', 'start_date', 'end_date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_compensation_info_eid_period', table_name='compensation_info')
@@ -0,0 +1,46 @@
+"""add change versions and change log
+
+Revision ID: 9e2a41c6b3d8
+Revises: 4c1f0d2e9a7b
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e2a41c6b3d8'
+down_revision = '4c1f0d2e9a7b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('change_log',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('table_name', sa.String(length=30), nullable=True),
+    sa.Column('row_id', sa.Integer(), nullable=True),
+    sa.Column('operation', sa.String(length=6), nullable=True),
+    sa.Column('changed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('change_sequence',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('INSERT INTO change_sequence (id, value) VALUES (1, 0)')
+    for table in ('employee', 'payroll_info', 'compensation_info'):
+        op.add_column(table, sa.Column('change_version', sa.BigInteger(), nullable=True))
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.create_index(op.f('ix_{}_change_version'.format(table)), table, ['change_version'], unique=False)
+
+
+def downgrade():
+    for table in ('compensation_info', 'payroll_info', 'employee'):
+        op.drop_index(op.f('ix_{}_change_version'.format(table)), table_name=table)
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'change_version')
+    op.drop_table('change_sequence')
+    op.drop_table('change_log')
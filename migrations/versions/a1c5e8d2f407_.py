@@ -0,0 +1,68 @@
+"""add the employee directory read table
+
+Revision ID: a1c5e8d2f407
+Revises: 3f7d9b2c6e14
+Create Date: 2026-10-19 21:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c5e8d2f407'
+down_revision = '3f7d9b2c6e14'
+branch_labels = None
+depends_on = None
+
+# one row per employee, with their first payroll row and the compensation
+# with the latest end date; the same rows app/directory.py computes
+POPULATE = """
+INSERT INTO employee_directory (id, company_id, first_name, last_name, middle_name,
+    email, home_phone, cell_phone, city, state, account_type, num_allowances,
+    latest_compensation_id, latest_start_date, latest_end_date, latest_gross_pay,
+    latest_net_pay)
+SELECT e.id, e.company_id, e.first_name, e.last_name, e.middle_name, e.email,
+    e.home_phone, e.cell_phone, e.city, e.state, p.account_type, p.num_allowances,
+    c.id, c.start_date, c.end_date, c.gross_pay, c.net_pay
+FROM employee e
+LEFT OUTER JOIN payroll_info p ON p.id = (
+    SELECT min(p2.id) FROM payroll_info p2 WHERE p2.eid = e.id)
+LEFT OUTER JOIN compensation_info c ON c.id = (
+    SELECT c2.id FROM compensation_info c2 WHERE c2.eid = e.id
+    ORDER BY c2.end_date DESC, c2.id DESC LIMIT 1)
+"""
+
+
+def upgrade():
+    op.create_table('employee_directory',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('company_id', sa.Integer(), server_default='1', nullable=False),
+    sa.Column('first_name', sa.String(length=60), nullable=True),
+    sa.Column('last_name', sa.String(length=60), nullable=True),
+    sa.Column('middle_name', sa.String(length=60), nullable=True),
+    sa.Column('email', sa.String(length=60), nullable=True),
+    sa.Column('home_phone', sa.String(length=60), nullable=True),
+    sa.Column('cell_phone', sa.String(length=60), nullable=True),
+    sa.Column('city', sa.String(length=60), nullable=True),
+    sa.Column('state', sa.String(length=60), nullable=True),
+    sa.Column('account_type', sa.String(length=60), nullable=True),
+    sa.Column('num_allowances', sa.Integer(), nullable=True),
+    sa.Column('latest_compensation_id', sa.Integer(), nullable=True),
+    sa.Column('latest_start_date', sa.Date(), nullable=True),
+    sa.Column('latest_end_date', sa.Date(), nullable=True),
+    sa.Column('latest_gross_pay', sa.Float(), nullable=True),
+    sa.Column('latest_net_pay', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    for column in ('company_id', 'last_name', 'email', 'state'):
+        op.create_index(op.f('ix_employee_directory_{}'.format(column)),
+                        'employee_directory', [column], unique=False)
+    op.execute(POPULATE)
+
+
+def downgrade():
+    for column in ('state', 'email', 'last_name', 'company_id'):
+        op.drop_index(op.f('ix_employee_directory_{}'.format(column)),
+                      table_name='employee_directory')
+    op.drop_table('employee_directory')
@@ -0,0 +1,26 @@
+"""index employee foreign keys
+
+Revision ID: b5350e4f7e8a
+Revises: 32cd1aa56e70
+Create Date: 2026-10-19 18:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5350e4f7e8a'
+down_revision = '32cd1aa56e70'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_compensation_info_eid_end_date', 'compensation_info', ['eid', 'end_date'], unique=False)
+    op.create_index(op.f('ix_payroll_info_eid'), 'payroll_info', ['eid'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_payroll_info_eid'), table_name='payroll_info')
+    op.drop_index('ix_compensation_info_eid_end_date', table_name='compensation_info')
@@ -0,0 +1,102 @@
+"""add the offboarding queue and archive tables
+
+Revision ID: c8e4b1f6a953
+Revises: 5e9c3a7d1b62
+Create Date: 2026-10-19 22:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e4b1f6a953'
+down_revision = '5e9c3a7d1b62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('offboarding',
+    sa.Column('eid', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('company_id', sa.Integer(), server_default='1', nullable=False),
+    sa.Column('requested_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('rows_archived', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('eid')
+    )
+    for column in ('company_id', 'finished_at'):
+        op.create_index(op.f('ix_offboarding_{}'.format(column)),
+                        'offboarding', [column], unique=False)
+
+    op.create_table('employee_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('first_name', sa.String(length=60), nullable=True),
+    sa.Column('last_name', sa.String(length=60), nullable=True),
+    sa.Column('middle_name', sa.String(length=60), nullable=True),
+    sa.Column('dob', sa.Date(), nullable=True),
+    sa.Column('email', sa.String(length=60), nullable=True),
+    sa.Column('street', sa.String(length=60), nullable=True),
+    sa.Column('city', sa.String(length=60), nullable=True),
+    sa.Column('state', sa.String(length=60), nullable=True),
+    sa.Column('zip', sa.Integer(), nullable=True),
+    sa.Column('home_phone', sa.String(length=60), nullable=True),
+    sa.Column('cell_phone', sa.String(length=60), nullable=True),
+    sa.Column('company_id', sa.Integer(), server_default='1', nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    for column in ('last_name', 'email', 'company_id', 'archived_at'):
+        op.create_index(op.f('ix_employee_archive_{}'.format(column)),
+                        'employee_archive', [column], unique=False)
+
+    op.create_table('payroll_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('account_type', sa.String(length=60), nullable=True),
+    sa.Column('account_num', sa.String(length=60), nullable=True),
+    sa.Column('routing_num', sa.String(length=60), nullable=True),
+    sa.Column('amount_withheld', sa.Integer(), nullable=True),
+    sa.Column('num_allowances', sa.Integer(), nullable=True),
+    sa.Column('claim_exemption', sa.Boolean(), nullable=True),
+    sa.Column('eid', sa.Integer(), nullable=True),
+    sa.Column('company_id', sa.Integer(), server_default='1', nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    for column in ('eid', 'company_id'):
+        op.create_index(op.f('ix_payroll_archive_{}'.format(column)),
+                        'payroll_archive', [column], unique=False)
+
+    op.create_table('compensation_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=True),
+    sa.Column('end_date', sa.Date(), nullable=True),
+    sa.Column('net_pay', sa.Float(), nullable=True),
+    sa.Column('gross_pay', sa.Float(), nullable=True),
+    sa.Column('hourly_wage', sa.Float(), nullable=True),
+    sa.Column('hours_worked', sa.Float(), nullable=True),
+    sa.Column('eid', sa.Integer(), nullable=True),
+    sa.Column('company_id', sa.Integer(), server_default='1', nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_compensation_archive_eid_end_date', 'compensation_archive',
+                    ['eid', 'end_date'], unique=False)
+    op.create_index(op.f('ix_compensation_archive_company_id'), 'compensation_archive',
+                    ['company_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_compensation_archive_company_id'), table_name='compensation_archive')
+    op.drop_index('ix_compensation_archive_eid_end_date', table_name='compensation_archive')
+    op.drop_table('compensation_archive')
+    for column in ('eid', 'company_id'):
+        op.drop_index(op.f('ix_payroll_archive_{}'.format(column)), table_name='payroll_archive')
+    op.drop_table('payroll_archive')
+    for column in ('last_name', 'email', 'company_id', 'archived_at'):
+        op.drop_index(op.f('ix_employee_archive_{}'.format(column)), table_name='employee_archive')
+    op.drop_table('employee_archive')
+    for column in ('company_id', 'finished_at'):
+        op.drop_index(op.f('ix_offboarding_{}'.format(column)), table_name='offboarding')
+    op.drop_table('offboarding')
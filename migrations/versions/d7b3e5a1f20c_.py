@@ -0,0 +1,26 @@
+"""add row versions for optimistic locking
+
+Revision ID: d7b3e5a1f20c
+Revises: 9e2a41c6b3d8
+Create Date: 2026-10-19 19:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7b3e5a1f20c'
+down_revision = '9e2a41c6b3d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('employee', 'payroll_info', 'compensation_info'):
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    for table in ('compensation_info', 'payroll_info', 'employee'):
+        op.drop_column(table, 'version')
@@ -0,0 +1,40 @@
+"""add the employee match key index for duplicate detection
+
+Revision ID: e2d6a9c4f718
+Revises: c8e4b1f6a953
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2d6a9c4f718'
+down_revision = 'c8e4b1f6a953'
+branch_labels = None
+depends_on = None
+
+# the keys are computed in Python (Soundex, phone normalization), so the
+# table is filled afterwards by `flask rebuild-match-keys`
+
+
+def upgrade():
+    op.create_table('employee_match_key',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('eid', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('value', sa.String(length=80), nullable=False),
+    sa.Column('company_id', sa.Integer(), server_default='1', nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_employee_match_key_eid'), 'employee_match_key', ['eid'],
+                    unique=False)
+    op.create_index('ix_employee_match_key_kind_value', 'employee_match_key',
+                    ['kind', 'value', 'company_id', 'eid'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_employee_match_key_kind_value', table_name='employee_match_key')
+    op.drop_index(op.f('ix_employee_match_key_eid'), table_name='employee_match_key')
+    op.drop_table('employee_match_key')
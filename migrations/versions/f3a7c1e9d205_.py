@@ -0,0 +1,97 @@
+"""add employee and payroll history tables for as-of queries
+
+Revision ID: f3a7c1e9d205
+Revises: e2d6a9c4f718
+Create Date: 2026-10-19 23:45:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a7c1e9d205'
+down_revision = 'e2d6a9c4f718'
+branch_labels = None
+depends_on = None
+
+# every row starts with its current contents, in effect since it was
+# last written; rows the change log never stamped, since the upgrade
+POPULATE_EMPLOYEES = """
+INSERT INTO employee_history (eid, first_name, last_name, middle_name, dob, email,
+    street, city, state, zip, home_phone, cell_phone, is_admin, company_id, valid_from)
+SELECT id, first_name, last_name, middle_name, dob, email, street, city, state, zip,
+    home_phone, cell_phone, is_admin, company_id, COALESCE(updated_at, :now)
+FROM employee
+"""
+
+POPULATE_PAYROLLS = """
+INSERT INTO payroll_history (payroll_id, account_type, account_num, routing_num,
+    amount_withheld, num_allowances, claim_exemption, eid, company_id, valid_from)
+SELECT id, account_type, account_num, routing_num, amount_withheld, num_allowances,
+    claim_exemption, eid, company_id, COALESCE(updated_at, :now)
+FROM payroll_info
+WHERE eid IS NOT NULL
+"""
+
+
+def upgrade():
+    op.create_table('employee_history',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('eid', sa.Integer(), nullable=False),
+    sa.Column('first_name', sa.String(length=60), nullable=True),
+    sa.Column('last_name', sa.String(length=60), nullable=True),
+    sa.Column('middle_name', sa.String(length=60), nullable=True),
+    sa.Column('dob', sa.Date(), nullable=True),
+    sa.Column('email', sa.String(length=60), nullable=True),
+    sa.Column('street', sa.String(length=60), nullable=True),
+    sa.Column('city', sa.String(length=60), nullable=True),
+    sa.Column('state', sa.String(length=60), nullable=True),
+    sa.Column('zip', sa.Integer(), nullable=True),
+    sa.Column('home_phone', sa.String(length=60), nullable=True),
+    sa.Column('cell_phone', sa.String(length=60), nullable=True),
+    sa.Column('is_admin', sa.Boolean(), nullable=True),
+    sa.Column('company_id', sa.Integer(), server_default='1', nullable=False),
+    sa.Column('valid_from', sa.DateTime(), nullable=False),
+    sa.Column('valid_to', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_employee_history_company_id'), 'employee_history',
+                    ['company_id'], unique=False)
+    op.create_index('ix_employee_history_eid_valid_from', 'employee_history',
+                    ['eid', 'valid_from'], unique=False)
+    op.create_table('payroll_history',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('payroll_id', sa.Integer(), nullable=False),
+    sa.Column('account_type', sa.String(length=60), nullable=True),
+    sa.Column('account_num', sa.String(length=60), nullable=True),
+    sa.Column('routing_num', sa.String(length=60), nullable=True),
+    sa.Column('amount_withheld', sa.Integer(), nullable=True),
+    sa.Column('num_allowances', sa.Integer(), nullable=True),
+    sa.Column('claim_exemption', sa.Boolean(), nullable=True),
+    sa.Column('eid', sa.Integer(), nullable=False),
+    sa.Column('company_id', sa.Integer(), server_default='1', nullable=False),
+    sa.Column('valid_from', sa.DateTime(), nullable=False),
+    sa.Column('valid_to', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_payroll_history_company_id'), 'payroll_history',
+                    ['company_id'], unique=False)
+    op.create_index('ix_payroll_history_eid_valid_from', 'payroll_history',
+                    ['eid', 'valid_from'], unique=False)
+
+    now = datetime.utcnow()
+    connection = op.get_bind()
+    connection.execute(sa.text(POPULATE_EMPLOYEES), now=now)
+    connection.execute(sa.text(POPULATE_PAYROLLS), now=now)
+
+
+def downgrade():
+    op.drop_index('ix_payroll_history_eid_valid_from', table_name='payroll_history')
+    op.drop_index(op.f('ix_payroll_history_company_id'), table_name='payroll_history')
+    op.drop_table('payroll_history')
+    op.drop_index('ix_employee_history_eid_valid_from', table_name='employee_history')
+    op.drop_index(op.f('ix_employee_history_company_id'), table_name='employee_history')
+    op.drop_table('employee_history')